@@ -0,0 +1,54 @@
+"""
+Import-time benchmark for the sound class table.
+
+Compares building the full eager table (`get_sound_regex`) with the lazy
+`SoundDict` restricted to the classes the rules actually use, and times a
+cold `import karma.structures` in fresh interpreters.
+
+    python benchmarks/import_time.py [--repeat 20]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from karma.utils import SoundDict, get_sound_regex
+
+used_keys = ["cons", "vow", "uv", "^qr_cons", "^tqr_cons", "^gqr_cons", "^r_cons"]
+
+def time_eager() -> float:
+    start = time.perf_counter()
+    get_sound_regex()
+    return time.perf_counter() - start
+
+def time_lazy() -> float:
+    start = time.perf_counter()
+    table = SoundDict()
+    for key in used_keys:
+        table[key]
+    return time.perf_counter() - start
+
+def time_cold_import(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).resolve().parent.parent)
+    return float(out.stdout.strip())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    eager = [time_eager() for _ in range(args.repeat)]
+    lazy = [time_lazy() for _ in range(args.repeat)]
+    cold = [time_cold_import("karma.structures") for _ in range(args.repeat)]
+    print(f"eager sound table: {statistics.median(eager) * 1000:8.3f} ms (median)")
+    print(f"lazy sound table:  {statistics.median(lazy) * 1000:8.3f} ms (median)")
+    print(f"cold import of karma.structures: {statistics.median(cold) * 1000:8.3f} ms (median)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmarks of the analyzer hot paths, with fixed inputs from the lexicon and
+from the test sentences below.
+
+Every case is timed call by call and reported as ops/s and latency percentiles,
+as JSON on stdout (or into `--output`). With `--baseline`, the median latency
+of every case is compared to the stored one, and the run fails if any case got
+slower by more than `--threshold` (a fraction, 0.25 by default). Baselines only
+make sense on the machine they were recorded on: record one with `--save`.
+
+    python benchmarks/suite.py [--only SUBSTRING] [--scale 1.0]
+                               [--baseline benchmarks/baseline.json] [--threshold 0.25]
+                               [--output results.json] [--save benchmarks/baseline.json]
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from import_time import time_cold_import
+from karma import structures
+from karma.affix_list import affixes
+from karma.ending_list import endings
+from karma.encode_decode import KarmaAnalyzer
+from karma.lexicon import build_lexicon, default_data_file, lexicon_fingerprint, read_snapshot, \
+    snapshot_path
+from karma.structures import MorphemeSeq
+
+SENTENCES = [
+    "nuuk illoqarfiuvoq angisooq.",
+    "inuit kalaallit nunaanni najugaqarput.",
+    "uanga hansimik ateqarpunga.",
+    "qimmit qimmiaraqarput.",
+    "aamma kalaallisut oqaluttuarpoq.",
+    "atuarfik angisooq, meeqqallu atuartut amerlasuupput.",
+    "ullumi sila kusanarpoq, taava aallarpugut.",
+    "jensen-ip 3-ani nr-imi maniitsumut aallarpoq!",
+]
+SHORT_WORDS = ["qimmit", "inuit", "sila", "aamma"]
+LONG_WORDS = ["qimmiaraqarput", "amerlasuupput", "illoqarfiuvoq", "najugaqarput"]
+
+SURFACE_FORMS = 2000  # lexicon forms whose surface gets realized
+JOIN_STEMS = 20  # stems per sandhi class
+JOIN_STEP = 10  # every JOIN_STEP-th affix and ending is joined onto them
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def measure(fn: Callable, inputs: list, calls: int) -> dict[str, float]:
+    """Call `fn` `calls` times, cycling through `inputs`, and summarize the latencies."""
+    fn(inputs[0])  # warm-up
+    latencies = []
+    for i in range(calls):
+        arg = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    return {"calls": calls,
+            "ops_per_s": calls / total if total else float("inf"),
+            "mean_ms": total / calls * 1000,
+            "min_ms": latencies[0] * 1000,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p90_ms": percentile(latencies, 0.90) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000}
+
+@contextmanager
+def caches_disabled(*caches):
+    sizes = [cache.maxsize for cache in caches]
+    for cache in caches:
+        cache.resize(0)
+    try:
+        yield
+    finally:
+        for cache, size in zip(caches, sizes):
+            cache.resize(size)
+
+def first_base_seq(analyzer: KarmaAnalyzer, word: str):
+    """The search state of the base of the first analysis of `word`, to run `subdecode` from."""
+    for seq in analyzer.decode(word):
+        base = seq.morphemes[0]
+        if isinstance(base, structures.Stem):
+            return MorphemeSeq(morphemes=[base], protected_len=base.protected_len).to_data()[0]
+    raise ValueError(f"no analysis of {word!r} starts with a stem")
+
+def run(only: str | None, scale: float) -> dict[str, dict[str, float]]:
+    def n(calls: int) -> int:
+        return max(1, int(calls * scale))
+
+    analyzer = KarmaAnalyzer(word_cache_size=0).load()
+    all_bases = sorted((b for l in analyzer.bases.values() for b in l), key=lambda b: b.form)
+    cases: dict[str, Callable[[], dict[str, float]]] = {}
+
+    # surfaces are realized from scratch: `_realize` is what `Form.surface` runs on a cache miss
+    surface_inputs = [*all_bases[:SURFACE_FORMS], *affixes, *endings]
+    cases["form.surface"] = lambda: measure(lambda m: m._realize(), surface_inputs, n(20_000))
+
+    by_class = defaultdict(list)
+    for base in all_bases:
+        by_class[type(base.right).__name__].append(base)
+    nonstems = [*affixes[::JOIN_STEP], *endings[::JOIN_STEP]]
+    for name, stems in sorted(by_class.items()):
+        pairs = [(stem, m) for stem in stems[:JOIN_STEMS] for m in nonstems]
+        def join_case(pairs=pairs):
+            with caches_disabled(structures.join_cache):
+                return measure(lambda p: p[0].join(p[1]), pairs, n(5_000))
+        cases[f"stem.join[{name}]"] = join_case
+
+    for kind, words in (("short", SHORT_WORDS), ("long", LONG_WORDS)):
+        def subdecode_case(words=words):
+            inputs = [(word, first_base_seq(analyzer, word)) for word in words]
+            return measure(lambda p: analyzer.subdecode(p[0], p[1], chart={}), inputs, n(4 * len(words)))
+        cases[f"subdecode.{kind}"] = subdecode_case
+    cases["decode"] = lambda: measure(analyzer.decode, SHORT_WORDS + LONG_WORDS,
+                                      n(2 * len(SHORT_WORDS + LONG_WORDS)))
+    cases["parse_sentence"] = lambda: measure(analyzer.parse_sentence, SENTENCES, n(len(SENTENCES)))
+
+    files = [default_data_file]
+    fingerprint = lexicon_fingerprint(files)
+    cases["import.karma.encode_decode"] = lambda: measure(
+        lambda module: time_cold_import(module), ["karma.encode_decode"], n(5))
+    cases["lexicon.build"] = lambda: measure(lambda f: build_lexicon(f), [files], n(3))
+    cases["lexicon.snapshot_load"] = lambda: measure(
+        lambda p: read_snapshot(p, fingerprint), [snapshot_path(fingerprint)], n(5))
+
+    results = {}
+    for name, case in cases.items():
+        if only and only not in name:
+            continue
+        results[name] = case()
+        print(f"{name:40s} {results[name]['ops_per_s']:12.1f} ops/s  "
+              f"p50 {results[name]['p50_ms']:10.3f} ms  p99 {results[name]['p99_ms']:10.3f} ms",
+              file=sys.stderr, flush=True)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """The cases whose median latency exceeds the baseline by more than `threshold`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result["p50_ms"] / base["p50_ms"] if base["p50_ms"] else 1.0
+        result["baseline_p50_ms"] = base["p50_ms"]
+        result["ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: p50 {base['p50_ms']:.3f} ms -> {result['p50_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", default=None, help="run only the cases whose name contains this")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of calls per case")
+    parser.add_argument("--baseline", type=Path, default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown of the median latency, as a fraction")
+    parser.add_argument("--output", type=Path, default=None, help="write the JSON report here")
+    parser.add_argument("--save", type=Path, default=None, help="store the results as a baseline")
+    args = parser.parse_args()
+
+    results = run(args.only, args.scale)
+    report = {"python": platform.python_version(),
+              "machine": platform.machine(),
+              "platform": platform.platform(),
+              "results": results}
+    regressions = []
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold)
+        report["threshold"] = args.threshold
+        report["regressions"] = regressions
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.save is not None:
+        baseline_report = {key: value for key, value in report.items() if key not in ("threshold", "regressions")}
+        args.save.write_text(json.dumps(baseline_report, indent=2) + "\n", encoding="utf-8")
+    for regression in regressions:
+        print("REGRESSION", regression, file=sys.stderr)
+    raise SystemExit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
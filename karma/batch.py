@@ -0,0 +1,150 @@
+"""
+Parsing many sentences at once, in a pool of worker processes or as one document.
+
+Each worker builds its own `KarmaAnalyzer` exactly once (from the lexicon
+snapshot, see `karma.lexicon`), and then only receives sentences.
+"""
+from __future__ import annotations
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
+import os
+import sys
+import time
+from .encode_decode import KarmaAnalyzer, ParseResult, MorphemeSeqData, default_analyzer, tokenize
+
+# the analyzer of the current worker process, set up by `_init_worker`
+_worker_analyzer: KarmaAnalyzer | None = None
+
+def _init_worker(analyzer: KarmaAnalyzer) -> None:
+    global _worker_analyzer
+    _worker_analyzer = analyzer.load()
+
+def _init_warm_worker(analyzer: KarmaAnalyzer, ready: multiprocessing.synchronize.Semaphore) -> None:
+    _init_worker(analyzer)
+    _worker_analyzer.parse_sentence("qimmit.")
+    ready.release()
+
+def _parse_chunk(sentences: list[str]) -> list[ParseResult]:
+    return [_worker_analyzer.parse_sentence(sent) for sent in sentences]
+
+def _decode_tokens(tokens: list[str]) -> list[tuple[list[MorphemeSeqData], bool]]:
+    return [_worker_analyzer.decode_token(token) for token in tokens]
+
+def _parse_one(sentence: str, deadline: float | None) -> tuple[list[list[str]], list[list[str]], bool]:
+    # `deadline` is a `time.time()` value, comparable across processes unlike `perf_counter`
+    max_seconds = None if deadline is None else max(0.0, deadline - time.time())
+    result = _worker_analyzer.parse_sentence(sentence, max_seconds=max_seconds)
+    return result.list_str, result.list_mofo_str, any(result.truncated)
+
+def _chunks(sentences: Iterable[str], chunksize: int) -> Iterator[list[str]]:
+    it = iter(sentences)
+    while chunk := list(islice(it, chunksize)):
+        yield chunk
+
+def parse_corpus(sentences: Iterable[str],
+                 workers: int | None = None,
+                 chunksize: int = 1,
+                 analyzer: KarmaAnalyzer | None = None,
+                 prefetch: int = 2) -> Iterator[ParseResult]:
+    """
+    Parse `sentences` (any iterable, read lazily) and yield their `ParseResult`s
+    in input order as soon as they are ready.
+
+    `workers` defaults to the number of CPUs; with `workers=1` everything runs
+    in this process. Sentences are sent to the workers `chunksize` at a time, and
+    at most `prefetch` chunks per worker are in flight, so memory stays bounded
+    however long the input is. The workers use copies of `analyzer`
+    (by default the module-level one), configuration only: each one loads its
+    own lexicon and keeps its own caches.
+    """
+    analyzer = analyzer or default_analyzer
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for sent in sentences:
+            yield analyzer.parse_sentence(sent)
+        return
+    # make sure the snapshot exists, so that no worker has to build the lexicon
+    analyzer.load()
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(analyzer,)) as pool:
+        pending: deque[Future] = deque()
+        try:
+            for chunk in _chunks(sentences, chunksize):
+                pending.append(pool.submit(_parse_chunk, chunk))
+                if len(pending) >= workers * prefetch:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # the caller may stop early: do not parse what nobody will read
+            for future in pending:
+                future.cancel()
+
+def parse_document(sentences: Iterable[str],
+                   workers: int | None = 1,
+                   chunksize: int = 16,
+                   analyzer: KarmaAnalyzer | None = None) -> list[ParseResult]:
+    """
+    Parse all of `sentences` at once, analyzing every distinct token only once.
+
+    The sentences are tokenized as in `parse_sentence`, the distinct tokens are
+    analyzed most frequent first (in `workers` processes, `chunksize` tokens at
+    a time, if more than one), and the `ParseResult`s of the sentences then
+    share the very same analysis list for each occurrence of a token.
+    Unlike `parse_corpus`, the whole input is read before anything is returned.
+    """
+    analyzer = analyzer or default_analyzer
+    tokenized = [tokenize(sent) for sent in sentences]
+    counts = Counter(token for tokens in tokenized for token in tokens)
+    types = [token for token, _ in counts.most_common()]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(types) <= chunksize:
+        decoded = [analyzer.decode_token(token) for token in types]
+    else:
+        analyzer.load()
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(analyzer,)) as pool:
+            decoded = [result for chunk in pool.map(_decode_tokens, _chunks(types, chunksize))
+                       for result in chunk]
+    analyses = dict(zip(types, decoded))
+    for token, (result, _) in analyses.items():
+        if result == []:
+            print("Warning:", token, file=sys.stderr, flush=True)
+    return [ParseResult(result=[analyses[token][0] for token in tokens],
+                        truncated=[analyses[token][1] for token in tokens])
+            for tokens in tokenized]
+
+def start_pool(workers: int, analyzer: KarmaAnalyzer | None = None) -> ProcessPoolExecutor:
+    """
+    Start `workers` processes for `submit_sentence`, each with its own copy of 
+    `analyzer` (by default the module-level one), and return once every one of 
+    them has loaded the lexicon and parsed a first sentence, so that no request 
+    waits for that. Shut the pool down when done.
+    """
+    analyzer = analyzer or default_analyzer
+    analyzer.load()
+    ready = multiprocessing.Semaphore(0)  # released by each worker once warm
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_warm_worker, initargs=(analyzer, ready))
+    # the pool starts a process for each task submitted while none is idle, i.e. all of them here
+    started = [pool.submit(os.getpid) for _ in range(workers)]
+    for _ in range(workers):
+        while not ready.acquire(timeout=1.0):
+            for future in started:
+                if future.done():
+                    future.result()  # raises BrokenProcessPool if a worker died while starting
+    return pool
+
+def submit_sentence(pool: ProcessPoolExecutor, sentence: str, 
+                    max_seconds: float | None = None) -> Future[tuple[list[list[str]], list[list[str]], bool]]:
+    """
+    Parse `sentence` in `pool`, into `ParseResult.list_str` and `list_mofo_str` 
+    and whether any token came out truncated. The search of the whole sentence 
+    stops `max_seconds` after this call, time spent waiting for a worker included.
+    """
+    deadline = None if max_seconds is None else time.time() + max_seconds
+    return pool.submit(_parse_one, sentence, deadline)
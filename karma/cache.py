@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable
+
+class LRUCache:
+    """
+    A bounded least-recently-used cache with hit/miss counters.
+
+    `maxsize=None` makes the cache unbounded, and `maxsize=0` disables it
+    (every lookup is a miss and nothing gets stored).
+
+    All operations hold a lock, so a cache can be shared between threads.
+    """
+
+    def __init__(self, maxsize: int | None = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize: int | None) -> None:
+        """Change the size limit, evicting the oldest entries if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            if maxsize is not None:
+                while len(self._data) > maxsize:
+                    self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, int | float | None]:
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hit_rate}
@@ -0,0 +1,81 @@
+"""
+Command-line entry point: parse sentences from files or stdin, one sentence
+per line, and stream one analysis record per line to stdout.
+
+    python -m karma [FILE ...] [--workers N] [--format jsonl|str|mofo] [--cache FILE]
+                    [--max-nodes N] [--max-seconds S] [--max-depth D] [--trace FILE]
+"""
+from __future__ import annotations
+from collections.abc import Iterator
+from itertools import tee
+import argparse
+import json
+import sys
+from .batch import parse_corpus
+from .encode_decode import KarmaAnalyzer, ParseResult, SearchLimits
+from .stats import SearchTracer
+
+def read_sentences(files: list[str]) -> Iterator[str]:
+    """Yield the lines of `files` (`-` being stdin) one at a time, lowercased."""
+    for file in files or ["-"]:
+        if file == "-":
+            for line in sys.stdin:
+                yield line.rstrip("\n").lower()
+        else:
+            with open(file, encoding="utf-8") as f:
+                for line in f:
+                    yield line.rstrip("\n").lower()
+
+def format_result(sentence: str, result: ParseResult, fmt: str) -> str:
+    if fmt == "jsonl":
+        return json.dumps({"sentence": sentence,
+                           "list_str": result.list_str,
+                           "list_mofo_str": result.list_mofo_str,
+                           "truncated": result.truncated}, ensure_ascii=False)
+    analyses = result.list_str if fmt == "str" else result.list_mofo_str
+    # one column per token, alternative analyses separated by " | "
+    return "\t".join(" | ".join(token) for token in analyses)
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="karma",
+                                     description="Morphologically analyze Kalaallisut sentences, one per line.")
+    parser.add_argument("files", nargs="*", default=[],
+                        help="input files (default: stdin; `-` also means stdin)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (0 means one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=1,
+                        help="number of sentences sent to a worker at a time")
+    parser.add_argument("--format", choices=["jsonl", "str", "mofo"], default="jsonl",
+                        help="jsonl records, or tab-separated tokens in the standard (str) or MOFO notation")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite file keeping the analyses of words across runs")
+    parser.add_argument("--max-nodes", type=int, default=None,
+                        help="maximum number of search states expanded per word")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="maximum search time per word")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="maximum number of morphemes (affixes, endings, enclitics) after the base")
+    parser.add_argument("--trace", default=None,
+                        help="write the search tree as folded stacks (microseconds) for flame graphs; "
+                             "runs in a single process")
+    args = parser.parse_args(argv)
+
+    # the sentences are needed again for the output, but only those in flight are kept
+    sentences, to_parse = tee(read_sentences(args.files))
+    limits = SearchLimits(max_nodes=args.max_nodes, max_seconds=args.max_seconds, max_depth=args.max_depth)
+    if limits == SearchLimits():
+        limits = None
+    analyzer = KarmaAnalyzer(store=args.cache, limits=limits)
+    workers = args.workers or None
+    if args.trace:
+        analyzer.tracer = SearchTracer()
+        workers = 1
+    results = parse_corpus(to_parse, workers=workers, chunksize=args.chunksize, analyzer=analyzer)
+    for sentence, result in zip(sentences, results):
+        sys.stdout.write(format_result(sentence, result, args.format) + "\n")
+        sys.stdout.flush()
+    if args.trace:
+        analyzer.tracer.export(args.trace)
+
+if __name__ == "__main__":
+    main()
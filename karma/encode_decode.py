@@ -1,26 +1,35 @@
 from .affix_list import affix_vn_dict
 from .ending_list import ending_vn_dict
-from .structures import is_ou, is_aie, is_cons, enclitics, Word, Stem, \
-    MorphemeSeq, MorphemeSeqData, DerivEnclitic, NounEnding, VerbEnding, \
-    NonEnding, NonStem, Affix, Ending, RightSandhi, SandhiPOS, \
-    Type1MetathesisSandhi, Type2MetathesisSandhi, HyphenSandhi, ReplaceSandhi, \
-    HTRSandhi, PassPartSandhi
-from .word_base import abbrs, get_protected_len, get_words_and_bases
-from dataclasses import dataclass
-from itertools import product
+from .structures import is_ou, is_aie, enclitics, Word, Stem, \
+    MorphemeSeq, MorphemeSeqData, MorphemePath, DerivEnclitic, VerbEnding, \
+    NonEnding, Affix, Ending, Enclitic, SandhiPOS, HyphenSandhi, Morpheme
+from .word_base import abbrs, BaseIndex
+from .lexicon import Lexicon, load_lexicon
+from .cache import LRUCache
+from .store import AnalysisStore, analysis_fingerprint
+from .stats import SearchStats, SearchTracer, traced
+from dataclasses import dataclass, field
+from functools import cached_property
+from collections.abc import Callable, Iterable, Iterator
+from heapq import heappop, heappush
+from itertools import islice, product
+from math import prod
 from pathlib import Path
+import re
+import sys
+from threading import Lock
+import time
 
 abbr_with_tilde = tuple(s + "~" for s in abbrs)
 
+# the morphemes completing a search state as a cons list (first, rest), 
+# sharing their tails, and the word they join into
+Suffix = tuple[Morpheme, "Suffix | None"]
+Completion = tuple[Suffix, Word]
+
 current_file = Path(__file__).resolve()
 data_file = current_file.parent / "morphemes.txt"
 
-words, bases = get_words_and_bases(files=[data_file])
-
-dep0cnt = [0]
-dep1cnt = [0]
-allcnt = [0]
-
 guess_dict = {
     "p": "vp",
     "v": "v",
@@ -43,166 +52,189 @@ guess_dict = {
     "r": "qrgy"
 }
 
-from collections import defaultdict
-affix_vn_init_dict: dict[SandhiPOS | None, dict[str, list[Affix]]] = {
-    SandhiPOS.VERB: defaultdict(list), 
-    SandhiPOS.NOUN: defaultdict(list), 
-    None: defaultdict(list)
-}
-for pos, affix_list in affix_vn_dict.items():
-    for affix in affix_list:
-        a_form = affix.form
-        if "^" in a_form:
-            if a_form == "t^": # special
-                special, spos = affix, pos
-            else:
-                affix_vn_init_dict[pos][a_form.split("^")[0][0]].append(affix)
-                affix_vn_init_dict[pos][a_form.split("^")[1][0]].append(affix)
-        else:
-            if len(a_form) > 1 and is_cons(a_form[0]) and is_cons(a_form[1]):
-                init = 1
-            else:
-                init = 0
-            affix_vn_init_dict[pos][a_form[init]].append(affix)
-            # TODO: temporary fix: təli => si, but s will not be detected
-            # currently -liq, -liuq and -lijaq are the only three, and the second of them are both i
-            # i may get changed to e (note we are attempting at the *surface* level, not form level)
-            if isinstance(affix.left, ReplaceSandhi): 
-                if affix.form == "liq": # fix minimally
-                    affix_vn_init_dict[pos]['e'].append(affix)
-                affix_vn_init_dict[pos]['i'].append(affix)
-            if isinstance(affix.left, HTRSandhi): 
-                affix_vn_init_dict[pos]['i'].append(affix)
-            if isinstance(affix.left, PassPartSandhi): 
-                affix_vn_init_dict[pos]['g'].append(affix)
-                
-for letter in affix_vn_init_dict[spos]:  # this is BAD
-    affix_vn_init_dict[spos][letter].append(special)
-
-def decode(word: str, words: dict[str, list[Word]], bases: dict[str, list[Stem]]):
-    result = []
-    init = word[0]
-    if is_ou(init):
-        loc_word = words["o|u"]
-    elif is_aie(init):
-        loc_word = words["a|i|e"]
-    else:
-        loc_word = words[init.lower()]
-    for dict_word in loc_word:
-        check_len = max(0, len(dict_word.surface) - 3)
-        if word[:check_len] == dict_word.surface[:check_len]:
-            if word == dict_word.surface:
-                result.append(MorphemeSeq(morphemes=[dict_word]).to_data()[0]) # originally dict_word.form
-            result += cliticdecode(word=word, seq=MorphemeSeq(morphemes=[dict_word]).to_data()[0])
-    init = word[0]
-    if word.startswith(tuple("0123456789")):
-        assert "~" in word
-        num, *rest = word.rsplit("~", maxsplit=1)  # TODO: this may be problematic if there can be two hyphens in a real word?
-        assert all([r.isalpha() for r in rest])
-        result = subdecode(word=word, 
-                           seq=MorphemeSeq(morphemes=[Stem(form=num, 
-                                                           right=HyphenSandhi(pos=SandhiPOS.NOUN))], 
-                                                           protected_len=len(num)+1).to_data()[0])
-    elif word in abbrs or word.startswith(abbr_with_tilde):
-        for abbr in abbrs:
-            if word.startswith(abbr):
-                result += subdecode(word=word, 
-                                    seq=MorphemeSeq(morphemes=[Stem(form=abbr, 
-                                                                    right=HyphenSandhi(pos=SandhiPOS.NOUN), 
-                                                                    protected_len=len(abbr)+1)], 
-                                                    protected_len=len(abbr)+1).to_data()[0])
-    else:
-        if is_ou(init):
-            loc_base = bases["o|u"].copy()
-        elif is_aie(init):
-            loc_base = bases["a|i|e"].copy()
-        else:
-            loc_base = bases[init.lower() + "|"].copy()
-        for init, l in bases.items():
-            if word.lower().startswith(init):
-                loc_base += l
-        # Frequent code for checking
-        # print("loc size:", len(loc_base), flush=True)
-        # print([b.form for b in loc_base], flush=True)
-        for base in loc_base:
-            result.extend(subdecode(word=word, 
-                                    seq=MorphemeSeq(morphemes=[base], 
-                                                    protected_len=base.protected_len).to_data()[0]))
-    return result
-
-def cliticdecode(word: str, seq: MorphemeSeqData, depth=0):
-    assert len(word) > 0
-    new_words: list[MorphemeSeqData] = []
-    last = seq.morphemes[-1]
-    assert isinstance(last, (Ending, Word))
-    for enclitic in enclitics:
-        if not isinstance(enclitic, DerivEnclitic):
-            if enclitic.form[-1] == word[-1]:  # TODO: may need to relax this
-                new_word_enc = seq.extend(morpheme=enclitic)
-                for joined in new_word_enc:
-                    if joined.repr.surface == word:
-                        new_words.append(joined)
-        #TODO: but what about qanorippit, and *=q*
-        elif not isinstance(last, VerbEnding): 
-            for new_stemseq in seq.extend(morpheme=enclitic):
-                new_words += subdecode(word=word, seq=new_stemseq, depth=depth)
-    return new_words
+@dataclass
+class SearchLimits:
+    """
+    Bounds on the search for the analyses of a single word: the number of expanded 
+    search states, the wall-clock time and the number of morphemes after the base
+    (affixes, endings and enclitics alike). None means unbounded.
+    """
+    max_nodes: int | None = None
+    max_seconds: float | None = None
+    max_depth: int | None = None
 
-def subdecode(word: str, seq: MorphemeSeqData, depth=0) -> list[MorphemeSeqData]:
-    stem = seq.repr
-    if depth == 0:
-        dep0cnt[0] += 1
-    if depth == 1:
-        dep1cnt[0] += 1
-    allcnt[0] += 1
-    # length = get_protected_len(stem)
-    if isinstance(stem.right, (Type1MetathesisSandhi, Type2MetathesisSandhi)):
-        length = len(stem.surface[:-4])
-    else:
-        length = len(stem.surface[:-3])
-    if len(word) <= length + 1 or word[:length] != stem.surface[:length]: # impossible branch
-        return []
-    next_affix_inits = word[length+2:length+6]
-    new_words: list[MorphemeSeqData] = []
-    last = seq.morphemes[-1]
-    assert isinstance(last, NonEnding)
-    for ending in ending_vn_dict[last.right.pos]:
-        if len(ending.form) + len(stem.form) <= len(word) + 5:
-            new_word = seq.extend(ending)
-            for joined in new_word:
-                add_len = max(2, len(ending.form) - 3) if "^" in ending.form else max(2, len(ending.form) - 1)
-                if joined.repr.surface == word:
-                    new_words.append(joined)
-                # NOTE: no enclitic does nothing to the word, so if surface matches, no need to check enclitics
-                elif len(ending.form) <= 2 or joined.repr.surface[:length+add_len] == word[:length+add_len]: 
-                    # TODO: temporarily assert the number of enclitics to be at most 1
-                    # for nw in new_word:
-                    new_words += cliticdecode(word=word, seq=joined, depth=depth+1)
-    real_keys = [k for k in guess_dict if k in next_affix_inits]
-    i_s = [ i for k in real_keys for i in guess_dict[k]]
-    real_affixes: set[Affix] = set()
-    for i in i_s:
-        for affix in affix_vn_init_dict[last.right.pos][i]:
-            real_affixes.add(affix)
-    # frequently used code for checking
-    # if stem.form == "":
-    #     print("test:", next_affix_inits, real_keys, i_s, [a.form for a in real_affixes])
-    for affix in real_affixes:
-        if len(affix.form) + len(stem.form) <= len(word) + 5:
-            for new_stemseq in seq.extend(affix):
-                new_words += subdecode(word=word, seq=new_stemseq, depth=depth+1)
-    return new_words
+    def start(self, deadline: float | None = None) -> "SearchBudget":
+        """A budget for one word, stopping at `deadline` (a `time.perf_counter()` value) at the latest."""
+        return SearchBudget(self, deadline)
+
+class SearchBudget:
+    """What is left of the `SearchLimits` while searching one word."""
+
+    def __init__(self, limits: SearchLimits, deadline: float | None = None):
+        self.limits = limits
+        self.deadline = None if limits.max_seconds is None else time.perf_counter() + limits.max_seconds
+        if deadline is not None and (self.deadline is None or deadline < self.deadline):
+            self.deadline = deadline
+        self.nodes = 0
+        self.exhausted = False  # out of nodes or time: the rest of the search is cut off
+        self.cutoffs = 0  # number of states not expanded (fully) because of a limit
+
+    @property
+    def truncated(self) -> bool:
+        return self.cutoffs > 0
+
+    def spend(self, depth: int) -> bool:
+        """Account for expanding a state at `depth`, or return False if no limit allows it."""
+        limits = self.limits
+        if not self.exhausted:
+            self.nodes += 1
+            if (limits.max_nodes is not None and self.nodes > limits.max_nodes) or \
+                    (self.deadline is not None and time.perf_counter() > self.deadline):
+                self.exhausted = True
+        if self.exhausted or (limits.max_depth is not None and depth > limits.max_depth):
+            self.cutoffs += 1
+            return False
+        return True
+
+    def allows_depth(self, depth: int) -> bool:
+        """Whether a morpheme may be added as the `depth`-th after the base, counting a cutoff if not."""
+        max_depth = self.limits.max_depth
+        if max_depth is not None and depth > max_depth:
+            self.cutoffs += 1
+            return False
+        return True
+
+class SearchContext:
+    """The per-word state threaded through the search: its chart, budget, statistics and tracer."""
+    __slots__ = ("chart", "budget", "stats", "tracer")
+
+    def __init__(self, chart: dict | None = None, budget: SearchBudget | None = None, 
+                 stats: SearchStats | None = None, tracer: SearchTracer | None = None):
+        self.chart = chart
+        self.budget = budget
+        self.stats = stats
+        self.tracer = tracer
+
+    def join(self, left: Stem | Word, right: Morpheme) -> list[Stem | Word]:
+        stats = self.stats
+        if stats is None:
+            return left.join(right)
+        stats.joins[type(left.right).__name__] += 1
+        start = time.perf_counter()
+        joined = left.join(right)
+        realized = time.perf_counter()
+        # realize the surfaces here, so that the search time does not include them
+        for form in joined:
+            form.surface
+        stats.join_seconds += realized - start
+        stats.surface_seconds += time.perf_counter() - realized
+        return joined
+
+    def counted(self, base: str, analyses: Iterable[MorphemeSeqData]) -> Iterable[MorphemeSeqData]:
+        """Count `analyses` as results of `base`, as they get consumed."""
+        if self.stats is None:
+            return analyses
+        return self._counted(base, analyses)
+
+    def _counted(self, base: str, analyses: Iterable[MorphemeSeqData]) -> Iterator[MorphemeSeqData]:
+        for analysis in analyses:
+            self.stats.results[base] += 1
+            yield analysis
+
+def trace_label(morpheme: Morpheme) -> str:
+    """How `morpheme` shows in a traced path: `iglu`, `-tu`, `=lu`."""
+    if isinstance(morpheme, Enclitic):
+        return "=" + morpheme.form
+    if isinstance(morpheme, (Affix, Ending)):
+        return "-" + (morpheme.form or "∅")
+    return morpheme.form
+
+def default_score(seq: MorphemeSeqData) -> float:
+    """Prefer analyses with fewer morphemes."""
+    return -len(seq.morphemes)
 
 @dataclass
 class ParseResult:
     result: list[list[MorphemeSeqData]]
+    # per token, whether a search limit cut its analyses short
+    truncated: list[bool] | None = None
+    # the search statistics of all the tokens, if asked for
+    stats: SearchStats | None = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.truncated is None:
+            self.truncated = [False] * len(self.result)
 
     def product(self) -> list:
-        return ["  ".join(map(str, p)) for p in product(*self.result)]
+        return list(self.iter_product())
+
+    def count(self) -> int:
+        """The number of combinations `product` would return, without enumerating them."""
+        return prod(len(lst) for lst in self.result)
 
-    def match(self, morph_seg: str) -> bool:
+    def iter_product(self) -> Iterator[str]:
+        """Yield the combinations of `product` one at a time."""
+        for p in product(*self.result):
+            yield "  ".join(map(str, p))
+
+    def iter_best(self, score: Callable[[MorphemeSeqData], float] = default_score
+                  ) -> Iterator[tuple[float, tuple[MorphemeSeqData, ...]]]:
+        """
+        Yield the combinations of one analysis per token together with their total 
+        `score` (the sum over the tokens), best first, without building the product.
+        """
+        if any(not lst for lst in self.result):
+            return
+        if not self.result:  # like `product`, an empty sentence has the one empty combination
+            yield 0, ()
+            return
+        scored = [sorted(((score(seq), seq) for seq in lst), key=lambda x: x[0], reverse=True) 
+                  for lst in self.result]
+        # NOTE: each combination is a tuple of indices into `scored`, and is only pushed 
+        # from the one predecessor that differs at its last non-zero index, so there are 
+        # no duplicates and the heap holds at most (number of tokens) entries per pop.
+        start = (0,) * len(scored)
+        heap = [(-sum(s[0][0] for s in scored), 0, start, 0)]
+        tie = 1
+        while heap:
+            neg_total, _, indices, first = heappop(heap)
+            yield -neg_total, tuple(s[i][1] for s, i in zip(scored, indices))
+            for pos in range(first, len(scored)):
+                i = indices[pos]
+                if i + 1 < len(scored[pos]):
+                    total = neg_total + scored[pos][i][0] - scored[pos][i+1][0]
+                    heappush(heap, (total, tie, indices[:pos] + (i + 1,) + indices[pos+1:], pos))
+                    tie += 1
+
+    def k_best(self, k: int, score: Callable[[MorphemeSeqData], float] = default_score
+               ) -> list[tuple[float, tuple[MorphemeSeqData, ...]]]:
+        """The `k` best combinations of `iter_best`."""
+        return list(islice(self.iter_best(score), k))
+
+    def match(self, morph_seg: str, mofo: bool = False) -> bool:
         morphs = morph_seg.split()
-        return all (morph in map(str, words) for morph, words in zip(morphs, self.result))
+        return all(morph in analyses for morph, analyses in zip(morphs, self._rendered(mofo)))
+
+    def match_many(self, candidates: Iterable[str], mofo: bool = False) -> list[list[bool]]:
+        """
+        For each candidate segmentation (whitespace-separated like in `match`), 
+        whether each of its tokens is among the analyses of that token.
+        """
+        rendered = self._rendered(mofo)
+        return [[morph in analyses for morph, analyses in zip(candidate.split(), rendered)] 
+                for candidate in candidates]
+
+    # the rendered analyses of each token, built on first use
+    @cached_property
+    def str_sets(self) -> list[frozenset[str]]:
+        return [frozenset(map(str, lst)) for lst in self.result]
+
+    @cached_property
+    def mofo_sets(self) -> list[frozenset[str]]:
+        return [frozenset(m.mofo_str for m in lst) for lst in self.result]
+
+    def _rendered(self, mofo: bool) -> list[frozenset[str]]:
+        return self.mofo_sets if mofo else self.str_sets
 
     @property
     def list_str(self) -> list[list[str]]:
@@ -212,28 +244,461 @@ class ParseResult:
     def list_mofo_str(self):
         return [list(map(lambda m: m.mofo_str, lst)) for lst in self.result]
 
-def parse_sentence(sent: str, words: list[Word] = words, bases: list[Stem] = bases) -> ParseResult:
-    # TODO: retain the dots after the numbers (and also in m2w_test.py)
-    import re
-    from itertools import product
-    sent_words = sent.strip().split()
-    decoded: list[list[MorphemeSeqData]] = []
-    for word in sent_words:
-        if word in (":", "-", "--", "»", "«"): # ignore punctuations
-            continue
+class KarmaAnalyzer:
+    """
+    A morphological analyzer owning its lexicon, indexes and caches.
+
+    Nothing is loaded upon creation: the lexicon is built (or loaded from its
+    snapshot) on first use, so several analyzers with different lexicon files
+    can live in one process without sharing any state.
+    """
+
+    def __init__(self, files: list[Path] | None = None, use_snapshot: bool = True, 
+                 chart: bool = True, word_cache_size: int | None = 10_000, 
+                 store: AnalysisStore | str | Path | None = None, 
+                 limits: SearchLimits | None = None):
+        self.files = files or [data_file]
+        self.use_snapshot = use_snapshot
+        self.chart = chart  # memoize the completions of search states within each word
+        self._lexicon: Lexicon | None = None
+        self._load_lock = Lock()
+        # analyses of normalized tokens, valid for the lexicon they were computed with
+        self.word_cache = LRUCache(maxsize=word_cache_size)
+        self._word_cache_lexicon: Lexicon | None = None
+        # optional persistent cache behind the word cache, shared across processes and runs
+        self.store = AnalysisStore(store) if isinstance(store, (str, Path)) else store
+        self._store_fingerprint: str | None = None
+        self.limits = limits  # bounds on the search of each word, none by default
+        self.tracer: SearchTracer | None = None  # set one to record the search tree
+
+    @property
+    def lexicon(self) -> Lexicon:
+        lexicon = self._lexicon
+        if lexicon is None:
+            # the first threads to analyze wait for one of them to load the lexicon
+            with self._load_lock:
+                if self._lexicon is None:
+                    self._lexicon = load_lexicon(files=self.files, use_snapshot=self.use_snapshot)
+                lexicon = self._lexicon
+        return lexicon
+
+    @property
+    def words(self) -> dict[str, list[Word]]:
+        return self.lexicon.words
+
+    @property
+    def bases(self) -> BaseIndex:
+        return self.lexicon.bases
+
+    @property
+    def affix_vn_init_dict(self) -> dict[SandhiPOS | None, dict[str, list[Affix]]]:
+        return self.lexicon.affix_vn_init_dict
+
+    def __getstate__(self):
+        # pickled (e.g. into worker processes) as its configuration only: 
+        # the copy loads its own lexicon on first use
+        state = self.__dict__.copy()
+        del state["_load_lock"]
+        state["_lexicon"] = None
+        state["_word_cache_lexicon"] = None
+        state["_store_fingerprint"] = None
+        state["word_cache"] = LRUCache(maxsize=self.word_cache.maxsize)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load_lock = Lock()
+
+    def load(self) -> "KarmaAnalyzer":
+        """Load the lexicon now rather than upon the first analysis."""
+        self.lexicon
+        return self
+
+    def reload(self, files: list[Path] | None = None) -> "KarmaAnalyzer":
+        """(Re)load the lexicon, e.g. after editing the lexicon files, dropping cached analyses."""
+        with self._load_lock:
+            if files is not None:
+                self.files = files
+            self._lexicon = load_lexicon(files=self.files, use_snapshot=self.use_snapshot)
+        self.word_cache.clear()
+        return self
+
+    def decode(self, word: str, 
+               words: dict[str, list[Word]] | None = None, 
+               bases: dict[str, list[Stem]] | None = None, 
+               max_results: int | None = None, 
+               budget: SearchBudget | None = None, 
+               stats: SearchStats | None = None) -> list[MorphemeSeqData]:
+        return list(self.iter_decode(word, words=words, bases=bases, max_results=max_results, 
+                                     budget=budget, stats=stats))
+
+    def iter_decode(self, word: str, 
+                    words: dict[str, list[Word]] | None = None, 
+                    bases: dict[str, list[Stem]] | None = None, 
+                    max_results: int | None = None, 
+                    budget: SearchBudget | None = None, 
+                    stats: SearchStats | None = None) -> Iterator[MorphemeSeqData]:
+        """
+        Yield the analyses of `word` as soon as each is found, stopping the search
+        after `max_results` of them (e.g. `max_results=1` to check that a word is analyzable).
+
+        The search is bounded by `budget`, by default a fresh one of `self.limits`;
+        pass one to find out afterwards whether it got `truncated`. 
+        With `stats`, the search is counted and timed into it.
+        """
+        if budget is None and self.limits is not None:
+            budget = self.limits.start()
+        ctx = SearchContext(chart={} if self.chart else None, budget=budget, stats=stats, 
+                            tracer=self.tracer)
+        analyses = self._iter_decode(word, words, bases, ctx)
+        if max_results is not None:
+            analyses = islice(analyses, max_results)
+        if stats is None:
+            yield from analyses
+            return
+        stats.words += 1
+        start = time.perf_counter()
+        try:
+            yield from analyses
+        finally:
+            stats.total_seconds += time.perf_counter() - start
+
+    def _iter_decode(self, word: str, 
+                     words: dict[str, list[Word]] | None, 
+                     bases: dict[str, list[Stem]] | None, 
+                     ctx: SearchContext) -> Iterator[MorphemeSeqData]:
+        if words is None:
+            words = self.words
+        if bases is None:
+            bases = self.bases
+        if word.startswith(tuple("0123456789")):
+            # NOTE: a number only ever gets analyzed as a stem, never as a dictionary word
+            assert "~" in word
+            num, *rest = word.rsplit("~", maxsplit=1)  # TODO: this may be problematic if there can be two hyphens in a real word?
+            assert all([r.isalpha() for r in rest])
+            seq = MorphemeSeq(morphemes=[Stem(form=num, right=HyphenSandhi(pos=SandhiPOS.NOUN))], 
+                              protected_len=len(num)+1).to_data()[0]
+            yield from ctx.counted(num, self._rebuild(seq, self._subdecode(word, seq.repr, seq.last, 0, ctx)))
+            return
+        init = word[0]
+        if is_ou(init):
+            loc_word = words["o|u"]
+        elif is_aie(init):
+            loc_word = words["a|i|e"]
+        else:
+            loc_word = words[init.lower()]
+        for dict_word in loc_word:
+            check_len = max(0, len(dict_word.surface) - 3)
+            if word[:check_len] == dict_word.surface[:check_len]:
+                seq = MorphemeSeq(morphemes=[dict_word]).to_data()[0]
+                if word == dict_word.surface:
+                    yield from ctx.counted(dict_word.form, [seq]) # originally dict_word.form
+                yield from ctx.counted(dict_word.form, 
+                                       self._rebuild(seq, self._cliticdecode(word, seq.repr, seq.last, 0, ctx)))
+        if word in abbrs or word.startswith(abbr_with_tilde):
+            for abbr in abbrs:
+                if word.startswith(abbr):
+                    seq = MorphemeSeq(morphemes=[Stem(form=abbr, 
+                                                      right=HyphenSandhi(pos=SandhiPOS.NOUN), 
+                                                      protected_len=len(abbr)+1)], 
+                                      protected_len=len(abbr)+1).to_data()[0]
+                    yield from ctx.counted(abbr, self._rebuild(seq, self._subdecode(word, seq.repr, seq.last, 0, ctx)))
         else:
-            word = word.replace("-", "~")
-            while word.endswith(tuple(".,!?»«:);")):
-                word = word[:-1]
-            while word.startswith(tuple(".,!?»«(")):
-                word = word[1:]
-            if word == "":
-                continue
-            if bool(re.match(pattern=r"^[0-9]+[a-z\.]?$", string=word)):
-                result = MorphemeSeq(morphemes=[Word(form=word)]).to_data()
-            else:
-                result = decode(word, words=words, bases=bases)
-                if result == []:
-                    print("Warning:", word, flush=True)
-        decoded.append(result)
-    return ParseResult(result=decoded)
+            if not isinstance(bases, BaseIndex):
+                bases = BaseIndex(bases)
+            loc_base = bases.candidates(word)
+            # Frequent code for checking
+            # print("loc size:", len(loc_base), flush=True)
+            # print([b.form for b in loc_base], flush=True)
+            for base in loc_base:
+                seq = MorphemeSeq(morphemes=[base], protected_len=base.protected_len).to_data()[0]
+                yield from ctx.counted(base.form, self._rebuild(seq, self._subdecode(word, seq.repr, seq.last, 0, ctx)))
+
+    def cliticdecode(self, word: str, seq: MorphemeSeqData, depth=0, 
+                     chart: dict | None = None, 
+                     budget: SearchBudget | None = None, 
+                     stats: SearchStats | None = None) -> list[MorphemeSeqData]:
+        return list(self.iter_cliticdecode(word, seq, depth, chart, budget, stats))
+
+    def subdecode(self, word: str, seq: MorphemeSeqData, depth=0, 
+                  chart: dict | None = None, 
+                  budget: SearchBudget | None = None, 
+                  stats: SearchStats | None = None) -> list[MorphemeSeqData]:
+        return list(self.iter_subdecode(word, seq, depth, chart, budget, stats))
+
+    def iter_cliticdecode(self, word: str, seq: MorphemeSeqData, depth=0, 
+                          chart: dict | None = None, 
+                          budget: SearchBudget | None = None, 
+                          stats: SearchStats | None = None) -> Iterator[MorphemeSeqData]:
+        ctx = SearchContext(chart=chart, budget=budget, stats=stats, tracer=self.tracer)
+        return self._rebuild(seq, self._cliticdecode(word, seq.repr, seq.last, depth, ctx))
+
+    def iter_subdecode(self, word: str, seq: MorphemeSeqData, depth=0, 
+                       chart: dict | None = None, 
+                       budget: SearchBudget | None = None, 
+                       stats: SearchStats | None = None) -> Iterator[MorphemeSeqData]:
+        ctx = SearchContext(chart=chart, budget=budget, stats=stats, tracer=self.tracer)
+        return self._rebuild(seq, self._subdecode(word, seq.repr, seq.last, depth, ctx))
+
+    @staticmethod
+    def _rebuild(seq: MorphemeSeqData, completions: Iterable[Completion]) -> Iterator[MorphemeSeqData]:
+        """Turn the completions of the search state of `seq` into full analyses."""
+        for suffix, rep in completions:
+            path = seq.path
+            while suffix is not None:
+                morpheme, suffix = suffix
+                path = MorphemePath(morpheme, path)
+            yield MorphemeSeqData(path=path, protected_len=seq.protected_len, repr=rep)
+
+    # NOTE: the search works on states (the joined form `repr` plus the last morpheme) 
+    # and yields their completions, i.e. the morphemes still to be appended together 
+    # with the final joined word. Different morpheme paths often reach the same state, 
+    # so with a `chart` the completions of each state are computed once per word.
+
+    @staticmethod
+    def _charted(ctx: SearchContext, key: tuple, expansion: Iterator[Completion]) -> Iterator[Completion]:
+        """
+        Yield the completions of a search state from the chart, or from `expansion` 
+        if it is not there yet. Only a fully expanded state gets stored: if the 
+        consumer stops early, or a search limit cuts off anything below the state, 
+        the partial completions are dropped.
+        """
+        chart, budget = ctx.chart, ctx.budget
+        if chart is None:
+            yield from expansion
+            return
+        if key in chart:
+            if ctx.stats is not None:
+                ctx.stats.chart_hits += 1
+            yield from chart[key]
+            return
+        cutoffs = 0 if budget is None else budget.cutoffs
+        completions: list[Completion] = []
+        for completion in expansion:
+            completions.append(completion)
+            yield completion
+        if budget is None or budget.cutoffs == cutoffs:
+            chart[key] = completions
+
+    @staticmethod
+    def _depth_key(depth: int, ctx: SearchContext) -> int | None:
+        # under a depth limit, what a state may still add depends on its depth
+        if ctx.budget is not None and ctx.budget.limits.max_depth is not None:
+            return depth
+        return None
+
+    def _cliticdecode(self, word: str, rep: Word, last: Ending | Word, depth: int, 
+                      ctx: SearchContext) -> Iterator[Completion]:
+        assert len(word) > 0
+        assert isinstance(last, (Ending, Word))
+        key = None
+        if ctx.chart is not None:
+            key = ("clitic", rep.form, rep.protected_len, rep.form_is_sound, rep.greenlandic_i, 
+                   rep.right.cons_end, isinstance(last, VerbEnding), self._depth_key(depth, ctx))
+        expansion = self._expand_clitic(word, rep, last, depth, ctx)
+        if ctx.tracer is not None:
+            expansion = traced(ctx.tracer, trace_label(last), expansion)
+        return self._charted(ctx, key, expansion)
+
+    def _expand_clitic(self, word: str, rep: Word, last: Ending | Word, depth: int, 
+                       ctx: SearchContext) -> Iterator[Completion]:
+        if ctx.budget is not None and not (ctx.budget.spend(depth) and ctx.budget.allows_depth(depth+1)):
+            return
+        if ctx.stats is not None:
+            ctx.stats.nodes[depth] += 1
+        for enclitic in enclitics:
+            if not isinstance(enclitic, DerivEnclitic):
+                if enclitic.form[-1] == word[-1]:  # TODO: may need to relax this
+                    for joined in ctx.join(rep, enclitic):
+                        if joined.surface == word:
+                            yield (enclitic, None), joined
+            #TODO: but what about qanorippit, and *=q*
+            elif not isinstance(last, VerbEnding): 
+                for new_stem in ctx.join(rep, enclitic):
+                    for suffix, final in self._subdecode(word, new_stem, enclitic, depth+1, ctx):
+                        yield (enclitic, suffix), final
+
+    def _subdecode(self, word: str, stem: Stem, last: NonEnding, depth: int, 
+                   ctx: SearchContext) -> Iterator[Completion]:
+        assert isinstance(last, NonEnding)
+        key = None
+        if ctx.chart is not None:
+            key = ("sub", stem.form, type(stem.right), stem.right.pos, stem.right.cons_end, 
+                   stem.protected_len, stem.greenlandic_i, last.right.pos, self._depth_key(depth, ctx))
+        expansion = self._expand_sub(word, stem, last, depth, ctx)
+        if ctx.tracer is not None:
+            expansion = traced(ctx.tracer, trace_label(last), expansion)
+        return self._charted(ctx, key, expansion)
+
+    def _expand_sub(self, word: str, stem: Stem, last: NonEnding, depth: int, 
+                    ctx: SearchContext) -> Iterator[Completion]:
+        budget, stats = ctx.budget, ctx.stats
+        if budget is not None and not budget.spend(depth):
+            return
+        if stats is not None:
+            stats.nodes[depth] += 1
+        # length = get_protected_len(stem)
+        length = stem.stable_len
+        if len(word) <= length + 1 or word[:length] != stem.surface[:length]: # impossible branch
+            if stats is not None:
+                stats.prunes["prefix"] += 1
+            return
+        next_affix_inits = word[length+2:length+6]
+        endings = ending_vn_dict[last.right.pos] if budget is None or budget.allows_depth(depth+1) else ()
+        for ending in endings:
+            if len(ending.form) + len(stem.form) <= len(word) + 5:
+                for joined in ctx.join(stem, ending):
+                    add_len = max(2, len(ending.form) - 3) if "^" in ending.form else max(2, len(ending.form) - 1)
+                    if joined.surface == word:
+                        yield (ending, None), joined
+                    # NOTE: no enclitic does nothing to the word, so if surface matches, no need to check enclitics
+                    elif len(ending.form) <= 2 or joined.surface[:length+add_len] == word[:length+add_len]: 
+                        # TODO: temporarily assert the number of enclitics to be at most 1
+                        for suffix, final in self._cliticdecode(word, joined, ending, depth+1, ctx):
+                            yield (ending, suffix), final
+                    elif stats is not None:
+                        stats.prunes["ending_prefix"] += 1
+            elif stats is not None:
+                stats.prunes["length"] += 1
+        real_keys = [k for k in guess_dict if k in next_affix_inits]
+        i_s = [ i for k in real_keys for i in guess_dict[k]]
+        real_affixes: set[Affix] = set()
+        for i in i_s:
+            for affix in self.affix_vn_init_dict[last.right.pos][i]:
+                real_affixes.add(affix)
+        if stats is not None:
+            stats.prunes["affix_init"] += max(0, len(affix_vn_dict[last.right.pos]) - len(real_affixes))
+        # frequently used code for checking
+        # if stem.form == "":
+        #     print("test:", next_affix_inits, real_keys, i_s, [a.form for a in real_affixes])
+        for affix in real_affixes:
+            if budget is not None and budget.exhausted:
+                return
+            if len(affix.form) + len(stem.form) <= len(word) + 5:
+                for new_stem in ctx.join(stem, affix):
+                    for suffix, final in self._subdecode(word, new_stem, affix, depth+1, ctx):
+                        yield (affix, suffix), final
+            elif stats is not None:
+                stats.prunes["length"] += 1
+
+    def _start_budget(self, deadline: float | None) -> SearchBudget | None:
+        if deadline is None:
+            return None if self.limits is None else self.limits.start()
+        return (self.limits or SearchLimits()).start(deadline)
+
+    def decode_token(self, word: str, 
+                     stats: SearchStats | None = None, 
+                     deadline: float | None = None) -> tuple[list[MorphemeSeqData], bool]:
+        """
+        Analyze a normalized token (see `normalize_token`), going through the word cache
+        and then the persistent store, if any, and tell whether a search limit (or 
+        the `time.perf_counter()` `deadline`) cut the analyses short. Truncated 
+        analyses are not cached.
+
+        The returned list is a copy, but the analyses in it are shared with the cache.
+        """
+        if bool(re.match(pattern=r"^[0-9]+[a-z\.]?$", string=word)):
+            return MorphemeSeq(morphemes=[Word(form=word)]).to_data(), False
+        lexicon = self.lexicon
+        if self._word_cache_lexicon is not lexicon:  # e.g. reloaded, or assigned by hand
+            self.word_cache.clear()
+            self._word_cache_lexicon = lexicon
+            self._store_fingerprint = None
+        result = self.word_cache.get(word)
+        if result is None:
+            if self.store is not None:
+                if self._store_fingerprint is None:  # also when the store was attached later
+                    self._store_fingerprint = analysis_fingerprint(lexicon)
+                result = self.store.get(self._store_fingerprint, word)
+            if result is None:
+                budget = self._start_budget(deadline)
+                result = self.decode(word, budget=budget, stats=stats)
+                if budget is not None and budget.truncated:
+                    return result, True
+                if self.store is not None:
+                    self.store.put(self._store_fingerprint, word, result)
+            elif stats is not None:
+                stats.cached_words += 1
+            self.word_cache.put(word, result)
+        elif stats is not None:
+            stats.cached_words += 1
+        return list(result), False
+
+    def parse_sentence(self, sent: str, 
+                       words: dict[str, list[Word]] | None = None, 
+                       bases: dict[str, list[Stem]] | None = None, 
+                       stats: bool = False, 
+                       max_seconds: float | None = None) -> ParseResult:
+        """
+        With `stats`, the `SearchStats` of all the tokens come with the result. 
+        `max_seconds` bounds the search time of the whole sentence, on top of the 
+        `limits` of each word: the tokens still unsearched by then come out truncated.
+        """
+        # TODO: retain the dots after the numbers (and also in m2w_test.py)
+        search_stats = SearchStats() if stats else None
+        deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+        decoded: list[list[MorphemeSeqData]] = []
+        truncated: list[bool] = []
+        for word in tokenize(sent):
+            if words is None and bases is None:
+                result, cut = self.decode_token(word, stats=search_stats, deadline=deadline)
+            elif bool(re.match(pattern=r"^[0-9]+[a-z\.]?$", string=word)):
+                result, cut = MorphemeSeq(morphemes=[Word(form=word)]).to_data(), False
+            else:  # a different lexicon than our own, so the word cache does not apply
+                budget = self._start_budget(deadline)
+                result = self.decode(word, words=words, bases=bases, budget=budget, stats=search_stats)
+                cut = budget is not None and budget.truncated
+            if result == []:
+                print("Warning:", word, file=sys.stderr, flush=True)
+            decoded.append(result)
+            truncated.append(cut)
+        return ParseResult(result=decoded, truncated=truncated, stats=search_stats)
+
+def normalize_token(word: str) -> str | None:
+    """
+    Normalize a whitespace-separated token of a sentence the way `parse_sentence` 
+    analyzes it, or return None for punctuation to be skipped.
+    """
+    if word in (":", "-", "--", "»", "«"): # ignore punctuations
+        return None
+    word = word.replace("-", "~")
+    while word.endswith(tuple(".,!?»«:);")):
+        word = word[:-1]
+    while word.startswith(tuple(".,!?»«(")):
+        word = word[1:]
+    if word == "":
+        return None
+    return word
+
+def tokenize(sent: str) -> list[str]:
+    """The normalized tokens of `sent` that `parse_sentence` analyzes, in order."""
+    return [token for word in sent.strip().split() if (token := normalize_token(word)) is not None]
+
+# The analyzer behind the module-level functions. It loads its lexicon on first use, 
+# so importing this module stays cheap.
+default_analyzer = KarmaAnalyzer()
+
+def decode(word: str, 
+           words: dict[str, list[Word]] | None = None, 
+           bases: dict[str, list[Stem]] | None = None) -> list[MorphemeSeqData]:
+    return default_analyzer.decode(word, words=words, bases=bases)
+
+def iter_decode(word: str, max_results: int | None = None) -> Iterator[MorphemeSeqData]:
+    return default_analyzer.iter_decode(word, max_results=max_results)
+
+def cliticdecode(word: str, seq: MorphemeSeqData, depth=0) -> list[MorphemeSeqData]:
+    return default_analyzer.cliticdecode(word, seq, depth=depth)
+
+def subdecode(word: str, seq: MorphemeSeqData, depth=0) -> list[MorphemeSeqData]:
+    return default_analyzer.subdecode(word, seq, depth=depth)
+
+def parse_sentence(sent: str, 
+                   words: dict[str, list[Word]] | None = None, 
+                   bases: dict[str, list[Stem]] | None = None) -> ParseResult:
+    return default_analyzer.parse_sentence(sent, words=words, bases=bases)
+
+def __getattr__(name: str):
+    # `words`, `bases` etc. used to be module globals built upon import
+    if name in ("lexicon", "words", "bases", "affix_vn_init_dict"):
+        return getattr(default_analyzer, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,187 @@
+"""
+Building the lexicon (words, bases and the affix index) and caching it
+in a versioned binary snapshot.
+
+The snapshot is keyed by a fingerprint of the lexicon files, the affix and
+ending lists and the code that turns them into `Word`s and `Stem`s, so it is
+simply rebuilt whenever any of them changes. Build it ahead of time with
+
+    python -m karma.lexicon [--snapshot-dir DIR]
+"""
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+import os
+import pickle
+import tempfile
+from .affix_list import affixes, affix_vn_dict
+from .ending_list import endings
+from .structures import Affix, Stem, Word, SandhiPOS, ReplaceSandhi, HTRSandhi, \
+    PassPartSandhi, is_cons
+from . import word_base
+from .word_base import BaseIndex, get_words_and_bases
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b"KARMA-LEXICON\n"
+
+default_data_file = Path(__file__).resolve().parent / "morphemes.txt"
+
+def default_snapshot_dir() -> Path:
+    return Path(os.environ.get("KARMA_CACHE_DIR", Path.home() / ".cache" / "karma"))
+
+@dataclass
+class Lexicon:
+    words: dict[str, list[Word]]
+    bases: BaseIndex
+    affix_vn_init_dict: dict[SandhiPOS | None, dict[str, list[Affix]]]
+    word_mappings: dict[str, tuple[str, bool]]
+    fingerprint: str = ""
+
+def build_affix_init_index(affix_vn_dict: dict[SandhiPOS | None, list[Affix]]
+                           ) -> dict[SandhiPOS | None, dict[str, list[Affix]]]:
+    """Index the affixes of each left POS by the letters their surface may start with."""
+    affix_vn_init_dict: dict[SandhiPOS | None, dict[str, list[Affix]]] = {
+        SandhiPOS.VERB: defaultdict(list),
+        SandhiPOS.NOUN: defaultdict(list),
+        None: defaultdict(list)
+    }
+    for pos, affix_list in affix_vn_dict.items():
+        for affix in affix_list:
+            a_form = affix.form
+            if "^" in a_form:
+                if a_form == "t^": # special
+                    special, spos = affix, pos
+                else:
+                    affix_vn_init_dict[pos][a_form.split("^")[0][0]].append(affix)
+                    affix_vn_init_dict[pos][a_form.split("^")[1][0]].append(affix)
+            else:
+                if len(a_form) > 1 and is_cons(a_form[0]) and is_cons(a_form[1]):
+                    init = 1
+                else:
+                    init = 0
+                affix_vn_init_dict[pos][a_form[init]].append(affix)
+                # TODO: temporary fix: təli => si, but s will not be detected
+                # currently -liq, -liuq and -lijaq are the only three, and the second of them are both i
+                # i may get changed to e (note we are attempting at the *surface* level, not form level)
+                if isinstance(affix.left, ReplaceSandhi):
+                    if affix.form == "liq": # fix minimally
+                        affix_vn_init_dict[pos]['e'].append(affix)
+                    affix_vn_init_dict[pos]['i'].append(affix)
+                if isinstance(affix.left, HTRSandhi):
+                    affix_vn_init_dict[pos]['i'].append(affix)
+                if isinstance(affix.left, PassPartSandhi):
+                    affix_vn_init_dict[pos]['g'].append(affix)
+
+    for letter in affix_vn_init_dict[spos]:  # this is BAD
+        affix_vn_init_dict[spos][letter].append(special)
+    return affix_vn_init_dict
+
+def lexicon_fingerprint(files: list[Path]) -> str:
+    """
+    Hash the lexicon files, the affix and ending lists and the source of the
+    modules building the lexicon from them, including the rules realizing the 
+    surfaces that the snapshot caches in its stems and tries.
+    """
+    h = sha256(f"karma-lexicon-v{SNAPSHOT_VERSION}".encode())
+    for file in files:
+        h.update(Path(file).read_bytes())
+    h.update(repr(affixes).encode())
+    h.update(repr(endings).encode())
+    for module_file in ("structures.py", "word_base.py", "lexicon.py", "rules.py", "utils.py"):
+        h.update((Path(__file__).resolve().parent / module_file).read_bytes())
+    return h.hexdigest()
+
+def build_lexicon(files: list[Path], fingerprint: str = "") -> Lexicon:
+    # the loanwords found in `files` only go into this lexicon, never into the shared table
+    word_mappings = dict(word_base.word_mappings)
+    words, bases = get_words_and_bases(files=files, mappings=word_mappings)
+    return Lexicon(words=words,
+                   bases=bases,
+                   affix_vn_init_dict=build_affix_init_index(affix_vn_dict),
+                   word_mappings=word_mappings,
+                   fingerprint=fingerprint)
+
+def snapshot_path(fingerprint: str, snapshot_dir: Path | None = None) -> Path:
+    # NOTE: one snapshot per lexicon file set
+    return (snapshot_dir or default_snapshot_dir()) / f"lexicon-v{SNAPSHOT_VERSION}-{fingerprint[:16]}.pickle"
+
+def save_snapshot(lexicon: Lexicon, path: Path) -> None:
+    # affixes are stored as indices into `affix_list.affixes`, so that the loaded
+    # index shares the very same `Affix` objects as the rest of the package
+    affix_ids = {id(affix): i for i, affix in enumerate(affixes)}
+    index = {pos: {letter: [affix_ids[id(a)] for a in l] for letter, l in d.items()}
+             for pos, d in lexicon.affix_vn_init_dict.items()}
+    payload = pickle.dumps((lexicon.words, lexicon.bases, index, lexicon.word_mappings),
+                           protocol=pickle.HIGHEST_PROTOCOL)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write-then-rename, so that concurrent readers never see a partial snapshot
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(lexicon.fingerprint.encode() + b"\n")
+            f.write(payload)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+def read_snapshot(path: Path, fingerprint: str) -> Lexicon | None:
+    """Load the snapshot at `path`, or return None if it is missing or stale."""
+    try:
+        with path.open("rb") as f:
+            if f.readline() != SNAPSHOT_MAGIC:
+                return None
+            if f.readline().rstrip(b"\n").decode() != fingerprint:
+                return None
+            words, bases, index, word_mappings = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    affix_vn_init_dict = {pos: defaultdict(list, {letter: [affixes[i] for i in l] for letter, l in d.items()})
+                          for pos, d in index.items()}
+    return Lexicon(words=words,
+                   bases=bases,
+                   affix_vn_init_dict=affix_vn_init_dict,
+                   word_mappings=word_mappings,
+                   fingerprint=fingerprint)
+
+def load_lexicon(files: list[Path] | None = None,
+                 use_snapshot: bool = True,
+                 snapshot_dir: Path | None = None) -> Lexicon:
+    """
+    Load the lexicon from its snapshot if the fingerprint still matches,
+    otherwise build it (and try to refresh the snapshot).
+    """
+    files = files or [default_data_file]
+    if not use_snapshot:
+        return build_lexicon(files)
+    fingerprint = lexicon_fingerprint(files)
+    path = snapshot_path(fingerprint, snapshot_dir)
+    lexicon = read_snapshot(path, fingerprint)
+    if lexicon is not None:
+        return lexicon
+    lexicon = build_lexicon(files, fingerprint=fingerprint)
+    try:
+        save_snapshot(lexicon, path)
+    except OSError:
+        pass  # e.g. a read-only home directory; the lexicon is built every time then
+    return lexicon
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Build the lexicon snapshot.")
+    parser.add_argument("files", nargs="*", type=Path, default=[default_data_file])
+    parser.add_argument("--snapshot-dir", type=Path, default=None)
+    args = parser.parse_args()
+    fingerprint = lexicon_fingerprint(args.files)
+    path = snapshot_path(fingerprint, args.snapshot_dir)
+    start = time.perf_counter()
+    lexicon = build_lexicon(args.files, fingerprint=fingerprint)
+    print(f"built lexicon in {time.perf_counter() - start:.3f}s")
+    save_snapshot(lexicon, path)
+    start = time.perf_counter()
+    assert read_snapshot(path, fingerprint) is not None
+    print(f"loaded snapshot {path} in {time.perf_counter() - start:.3f}s")
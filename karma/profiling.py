@@ -0,0 +1,164 @@
+"""
+Profiling of the morphophonology: calls and time of every `right_join` / `left_join`
+implementation of the sandhi classes, and of every rule of the rewrite engines
+in `karma.rules`.
+
+Switch it on around any code:
+
+    from karma.profiling import profiling
+    with profiling() as profile:
+        parse_sentence("qimmit qimmiaraqarput.")
+    print(profile.report())
+
+or globally with `enable()` / `disable()`. While enabled, the methods and the
+engines are patched with timing wrappers, so it costs nothing when off; it is
+not meant for use from several threads at once. Only what actually runs is
+measured: joins and surfaces answered from `join_cache` / `surface_cache` do not
+show up.
+"""
+from __future__ import annotations
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+import time
+from .rules import RewriteEngine
+from .structures import BaseSandhi
+
+@dataclass
+class Timing:
+    calls: int = 0
+    seconds: float = 0.0  # inclusive, i.e. with the time of the `super()` calls
+    self_seconds: float = 0.0  # exclusive of other profiled joins called from this one
+
+@dataclass
+class RuleTiming:
+    calls: int = 0  # times the rule got to look at a form
+    skips: int = 0  # times the `requires` prefilter spared it the look
+    fires: int = 0  # times it changed the form
+    seconds: float = 0.0
+
+@dataclass
+class SandhiProfile:
+    joins: dict[str, Timing] = field(default_factory=dict)  # by `Class.method`
+    rules: dict[str, RuleTiming] = field(default_factory=dict)  # by `engine:rule`
+    # time of the profiled joins running inside the one being timed, innermost last
+    _children: list[float] = field(default_factory=list, repr=False)
+
+    def clear(self) -> None:
+        self.joins.clear()
+        self.rules.clear()
+
+    def report(self, top: int | None = None) -> str:
+        lines = [f"{'join':40s} {'calls':>10s} {'total s':>10s} {'self s':>10s} {'us/call':>10s}"]
+        joins = sorted(self.joins.items(), key=lambda x: x[1].self_seconds, reverse=True)
+        for name, t in joins[:top]:
+            lines.append(f"{name:40s} {t.calls:10d} {t.seconds:10.4f} {t.self_seconds:10.4f} "
+                         f"{t.seconds / t.calls * 1e6 if t.calls else 0.0:10.2f}")
+        lines.append("")
+        lines.append(f"{'rule':40s} {'calls':>10s} {'skips':>10s} {'fires':>10s} {'total s':>10s}")
+        rules = sorted(self.rules.items(), key=lambda x: x[1].seconds, reverse=True)
+        for name, r in rules[:top]:
+            lines.append(f"{name:40s} {r.calls:10d} {r.skips:10d} {r.fires:10d} {r.seconds:10.4f}")
+        return "\n".join(lines)
+
+_profile: SandhiProfile | None = None
+# the unpatched (class, name, function)s, to restore upon `disable`
+_originals: list[tuple[type, str, Callable]] = []
+
+def _sandhi_classes(cls: type = BaseSandhi) -> Iterator[type]:
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _sandhi_classes(subclass)
+
+def _timed_join(name: str, join: Callable) -> Callable:
+    @wraps(join)
+    def timed(*args, **kwargs):
+        profile = _profile
+        children = profile._children
+        children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return join(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            child_seconds = children.pop()
+            if children:
+                children[-1] += elapsed
+            timing = profile.joins.get(name)
+            if timing is None:
+                timing = profile.joins[name] = Timing()
+            timing.calls += 1
+            timing.seconds += elapsed
+            timing.self_seconds += elapsed - child_seconds
+    return timed
+
+def _profiled_call(engine: RewriteEngine, form: str) -> str:
+    """`RewriteEngine.__call__`, timing and counting every rule."""
+    rules = _profile.rules
+    for rule in engine.rules:
+        key = f"{engine.name}:{rule.name}"
+        timing = rules.get(key)
+        if timing is None:
+            timing = rules[key] = RuleTiming()
+        start = time.perf_counter()
+        if any(char not in form for char in rule.requires):
+            timing.skips += 1
+            timing.seconds += time.perf_counter() - start
+            continue
+        new_form = rule.apply(form)
+        timing.seconds += time.perf_counter() - start
+        timing.calls += 1
+        if new_form != form:
+            timing.fires += 1
+            form = new_form
+    return form
+
+def enable(profile: SandhiProfile | None = None) -> SandhiProfile:
+    """Start profiling into `profile` (a new one by default) and return it."""
+    global _profile
+    if _profile is not None:
+        raise RuntimeError("profiling is already enabled")
+    _profile = profile or SandhiProfile()
+    for cls in _sandhi_classes():
+        for name in ("right_join", "left_join"):
+            if name in cls.__dict__:
+                join = cls.__dict__[name]
+                _originals.append((cls, name, join))
+                setattr(cls, name, _timed_join(f"{cls.__name__}.{name}", join))
+    _originals.append((RewriteEngine, "__call__", RewriteEngine.__dict__["__call__"]))
+    RewriteEngine.__call__ = _profiled_call
+    return _profile
+
+def disable() -> SandhiProfile | None:
+    """Stop profiling, restore the original methods and return the profile."""
+    global _profile
+    while _originals:
+        cls, name, function = _originals.pop()
+        setattr(cls, name, function)
+    profile, _profile = _profile, None
+    return profile
+
+def is_enabled() -> bool:
+    return _profile is not None
+
+@contextmanager
+def profiling(profile: SandhiProfile | None = None) -> Iterator[SandhiProfile]:
+    profile = enable(profile)
+    try:
+        yield profile
+    finally:
+        disable()
+
+if __name__ == "__main__":
+    import argparse
+    from .encode_decode import KarmaAnalyzer
+    parser = argparse.ArgumentParser(description="Profile the sandhi joins and rewrite rules over some sentences.")
+    parser.add_argument("sentences", nargs="+")
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args()
+    analyzer = KarmaAnalyzer().load()
+    with profiling() as profile:
+        for sent in args.sentences:
+            analyzer.parse_sentence(sent.lower())
+    print(profile.report(top=args.top))
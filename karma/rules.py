@@ -0,0 +1,216 @@
+import re
+from dataclasses import dataclass, field
+from .utils import sound_dict
+
+@dataclass
+class RewriteRule:
+    """
+    One ordered rewrite step of the sound/spelling rules.
+
+    A literal rule is a plain `str.replace`; otherwise `pattern` is a regex
+    compiled once upon creation. `requires` lists characters that must all
+    be present in the form for the rule to possibly match, so that most rules
+    can be skipped without scanning the form with the regex engine.
+    """
+    name: str
+    pattern: str
+    repl: str
+    literal: bool = False
+    requires: str = ""
+    compiled: re.Pattern | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if not self.literal:
+            self.compiled = re.compile(self.pattern)
+
+    def apply(self, form: str) -> str:
+        for char in self.requires:
+            if char not in form:
+                return form
+        if self.literal:
+            return form.replace(self.pattern, self.repl)
+        return self.compiled.sub(self.repl, form)
+
+class RewriteEngine:
+    """
+    A sequence of `RewriteRule`s applied in order.
+
+    The rules are fed to the engine once at import, so no pattern is
+    rebuilt or recompiled at call time.
+    """
+
+    def __init__(self, name: str, rules: list[RewriteRule]):
+        self.name = name
+        self.rules = rules
+        self._steps = [(rule.requires, rule.literal, rule.pattern, rule.repl, rule.compiled)
+                       for rule in rules]
+
+    def __call__(self, form: str) -> str:
+        for requires, literal, pattern, repl, compiled in self._steps:
+            for char in requires:
+                if char not in form:
+                    break
+            else:
+                form = form.replace(pattern, repl) if literal else compiled.sub(repl, form)
+        return form
+
+    def __repr__(self):
+        return f"RewriteEngine({self.name!r}, {len(self.rules)} rules)"
+
+cons = sound_dict['cons']
+vow = sound_dict['vow']
+uv = sound_dict['uv']
+
+get_sound = RewriteEngine("get_sound", [
+    RewriteRule("ð-rule-1", f"({cons})ð", r"\1t", requires="ð"),
+    RewriteRule("ð-rule-2", f"({vow})ð", r"\1c", requires="ð"),
+    RewriteRule("t2s-rule", f"i({cons}?)t({vow})", r"i\1s\2", requires="it"),
+    # release those not to be affected by the t2s rule
+    RewriteRule("T-release", "T", "t", literal=True),
+    RewriteRule("y-rule-1", f"({cons})y", r"\1g", requires="y"),
+    RewriteRule("y-rule-2", f"({vow})y", r"\1j", requires="y"),
+    RewriteRule("ə-rule-1", f"ə({cons})", r"i\1", requires="ə"),
+    RewriteRule("ə-rule-2", "ə([aiuəj])", r"a\1", requires="ə"),
+    RewriteRule("aai-rule", "aai", "aavi", literal=True),
+    RewriteRule("aau-rule", "aau", "aaju", literal=True),
+])
+
+adjust_sound = RewriteEngine("adjust_sound", [
+    # modified a-rule to exclude -ai-ending ones
+    RewriteRule("a-rule", rf"a(?!i\Z){vow}", "aa", requires="a"),
+    # TODO: t(ts)-rule
+    RewriteRule("g-rule", "qg", "r", literal=True),
+    # consonant-rules
+    RewriteRule("cons-rule-1", f"{sound_dict['^qr_cons']}([qtslmnŋf])", r"\1\1"),
+    RewriteRule("cons-rule-2", f"{sound_dict['^tqr_cons']}c", "cc", requires="c"),
+    RewriteRule("cons-rule-3", "[qr]([tcslmn])", r"r\1"),
+    RewriteRule("cons-rule-4", f"{sound_dict['^qr_cons']}[vp]", "pp"),
+    RewriteRule("cons-rule-5", "[qr][vp]", "rp"),
+    RewriteRule("cons-rule-6", f"{sound_dict['^gqr_cons']}[gk]", "kk"),
+    RewriteRule("cons-rule-7", "[qr][gk]", "rk"),
+    # RewriteRule("[qr]v", "rp"),
+    RewriteRule("uv-rule-1a", f"i({uv})", r"e\1", requires="i"),
+    RewriteRule("uv-rule-1b", "ie", "ee", literal=True),
+    RewriteRule("uv-rule-2a", f"u({uv})", r"o\1", requires="u"),
+    RewriteRule("uv-rule-2b", "uo", "oo", literal=True),
+    RewriteRule("rf-rule", "[qr]f", "rf", requires="f"),
+    RewriteRule("qq-rule", f"{sound_dict['^r_cons']}r", "qq", requires="r"),
+    # RewriteRule("[rq]q", "qq"), RewriteRule("jj", "ss"),
+    RewriteRule("ij-rule", "ij", "i", literal=True),
+    RewriteRule("uv-drop-rule", "uv([aie])", r"u\1", requires="uv"),
+    RewriteRule("uuu-rule", "uuu", "uuju", literal=True),
+    RewriteRule("iii-rule", "iii", "iivi", literal=True),
+    RewriteRule("aaa-rule", "aaa", "aava", literal=True),
+])
+
+# long vowels written with V in affixes and enclitics
+lengthen_v = RewriteEngine("lengthen_v", [
+    RewriteRule("V-rule", f"({vow})V", r"\1\1", requires="V"),
+])
+
+# TODO: we might need to add Vq/rC to here, depending on acc
+sound_to_spelling = RewriteEngine("sound_to_spelling", [
+    RewriteRule("ŋŋ-spelling", "ŋŋ", "nng", literal=True),
+    RewriteRule("ŋ-spelling", "ŋ", "ng", literal=True),
+    RewriteRule("tti-spelling", "tti", "tsi", literal=True),
+    RewriteRule("tte-spelling", "tte", "tse", literal=True),
+    RewriteRule("c-spelling", "c", "s", literal=True),
+    RewriteRule("ɴɴ-spelling", "ɴɴ", "rng", literal=True),
+    RewriteRule("ɴ-spelling", "ɴ", "rng", literal=True),
+])
+
+# The original sequential `re.sub` chain, kept as the reference for `check_equivalence`.
+
+def legacy_get_sound(form: str) -> str:
+    form = re.sub(pattern=f"({sound_dict['cons']})ð", repl=r"\1t", string=form)   # ð-rule-1
+    form = re.sub(pattern=f"({sound_dict['vow']})ð", repl=r"\1c", string=form)   # ð-rule-2
+    form = re.sub(pattern=f"i({sound_dict['cons']}?)t({sound_dict['vow']})", repl=r"i\1s\2", string=form) # t2s-rule
+    form = form.replace("T", "t") # release those not to be affected by the t2s rule
+    form = re.sub(pattern=f"({sound_dict['cons']})y", repl=r"\1g", string=form)  # y-rule-1
+    form = re.sub(pattern=f"({sound_dict['vow']})y", repl=r"\1j", string=form) # y-rule-2
+    form = re.sub(pattern=f"ə({sound_dict['cons']})", repl=r"i\1", string=form) # ə-rule-1
+    form = re.sub(pattern=f"ə([aiuəj])", repl=r"a\1", string=form) # ə-rule-2
+    form = form.replace("aai", "aavi")
+    form = form.replace("aau", "aaju")
+    return form
+
+def legacy_adjust_sound(form: str) -> str:
+    form = re.sub(pattern=rf"a(?!i\Z){sound_dict['vow']}", repl=r"aa", string=form)
+    form = form.replace("qg", "r")
+    form = re.sub(pattern=f"{sound_dict['^qr_cons']}([qtslmnŋf])", repl=r"\1\1", string=form)
+    form = re.sub(pattern=f"{sound_dict['^tqr_cons']}c", repl=r"cc", string=form)
+    form = re.sub(pattern="[qr]([tcslmn])", repl=r"r\1", string=form)
+    form = re.sub(pattern=f"{sound_dict['^qr_cons']}[vp]", repl="pp", string=form)
+    form = re.sub(pattern=f"[qr][vp]", repl="rp", string=form)
+    form = re.sub(pattern=f"{sound_dict['^gqr_cons']}[gk]", repl="kk", string=form)
+    form = re.sub(pattern=f"[qr][gk]", repl="rk", string=form)
+    form = re.sub(pattern=f"i({sound_dict['uv']})", repl=r"e\1", string=form) # uv-rule-1
+    form = form.replace("ie", "ee") # uv-rule-1
+    form = re.sub(pattern=f"u({sound_dict['uv']})", repl=r"o\1", string=form) # uv-rule-2
+    form = form.replace("uo", "oo") # uv-rule-2
+    form = re.sub(pattern="[qr]f", repl="rf", string=form)
+    form = re.sub(pattern=f"{sound_dict['^r_cons']}r", repl="qq", string=form)
+    form = form.replace("ij", "i")
+    form = re.sub("uv([aie])", r"u\1", form)
+    form = form.replace("uuu", "uuju")
+    form = form.replace("iii", "iivi")
+    form = form.replace("aaa", "aava")
+    return form
+
+def legacy_sound_to_spelling(form: str) -> str:
+    form = form.replace("ŋŋ", "nng")
+    form = form.replace("ŋ", "ng")
+    form = form.replace("tti", "tsi")
+    form = form.replace("tte", "tse")
+    form = form.replace("c", "s")
+    form = form.replace("ɴɴ", "rng")
+    form = form.replace("ɴ", "rng")
+    return form
+
+def _lexicon_forms() -> set[tuple[str, bool]]:
+    """
+    Every (form, form_is_sound) the lexicon and the affix/ending/enclitic lists
+    produce, including the forms of all one-step joins onto a base or a word.
+    """
+    from .affix_list import affixes
+    from .ending_list import endings
+    from .structures import enclitics, Morpheme
+    from .encode_decode import words, bases
+
+    all_bases = [base for l in bases.values() for base in l]
+    all_words = [word for l in words.values() for word in l]
+    morphemes: list[Morpheme] = [*all_bases, *all_words, *affixes, *endings, *enclitics]
+    joined: list[Morpheme] = []
+    for base in all_bases:
+        for nonstem in [*affixes, *endings]:
+            joined += base.join(nonstem)
+    for word in all_words:
+        for enclitic in enclitics:
+            joined += word.join(enclitic)
+    # the rules only ever see the unprotected part of a form
+    return {(m.form[m.protected_len:], m.form_is_sound) for m in [*morphemes, *joined]}
+
+def check_equivalence(forms: set[tuple[str, bool]] | None = None) -> list[str]:
+    """
+    Run the legacy `re.sub` chain and the compiled engines over `forms`
+    (by default, every form from `_lexicon_forms`) and return the mismatching forms.
+    """
+    if forms is None:
+        forms = _lexicon_forms()
+    mismatches = []
+    for form, form_is_sound in sorted(forms):
+        old = form if form_is_sound else legacy_get_sound(form)
+        new = form if form_is_sound else get_sound(form)
+        old = legacy_adjust_sound(old)
+        new = adjust_sound(new)
+        if old != new or legacy_sound_to_spelling(old) != sound_to_spelling(new):
+            mismatches.append(form)
+    return mismatches
+
+if __name__ == "__main__":
+    forms = _lexicon_forms()
+    mismatches = check_equivalence(forms)
+    print(f"checked {len(forms)} forms, {len(mismatches)} mismatches")
+    for form in mismatches:
+        print("mismatch:", form)
+    raise SystemExit(1 if mismatches else 0)
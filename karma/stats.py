@@ -0,0 +1,154 @@
+"""
+Statistics and traces of the analyzer's search, to find out which words are slow and why.
+"""
+from __future__ import annotations
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+
+# the rules cutting a branch of the search, see `SearchStats.prunes`
+PRUNE_RULES = {
+    "prefix": "the stable part of the stem does not match the word",
+    "length": "the morpheme is too long for the rest of the word",
+    "ending_prefix": "the word after an ending does not match, so no enclitic can follow",
+    "affix_init": "the affix cannot start with the next letters of the word",
+}
+
+@dataclass
+class SearchStats:
+    """
+    Counters and timings of one or more searches. Pass one to `KarmaAnalyzer.decode`
+    (or `parse_sentence(..., stats=True)`) to have it filled in; it adds up over calls.
+    """
+    words: int = 0  # words searched
+    cached_words: int = 0  # words answered from the word cache or the store, without a search
+    nodes: Counter[int] = field(default_factory=Counter)  # search states expanded per depth
+    chart_hits: int = 0  # search states answered from the chart
+    joins: Counter[str] = field(default_factory=Counter)  # joins per sandhi class of the left morpheme
+    prunes: Counter[str] = field(default_factory=Counter)  # branches cut per rule of `PRUNE_RULES`
+    results: Counter[str] = field(default_factory=Counter)  # analyses per base (or dictionary word)
+    total_seconds: float = 0.0
+    join_seconds: float = 0.0
+    surface_seconds: float = 0.0
+
+    @property
+    def search_seconds(self) -> float:
+        """Time spent in the search itself, i.e. neither joining nor realizing surfaces."""
+        return self.total_seconds - self.join_seconds - self.surface_seconds
+
+    def merge(self, other: SearchStats) -> SearchStats:
+        self.words += other.words
+        self.cached_words += other.cached_words
+        self.nodes.update(other.nodes)
+        self.chart_hits += other.chart_hits
+        self.joins.update(other.joins)
+        self.prunes.update(other.prunes)
+        self.results.update(other.results)
+        self.total_seconds += other.total_seconds
+        self.join_seconds += other.join_seconds
+        self.surface_seconds += other.surface_seconds
+        return self
+
+    def to_dict(self) -> dict:
+        return {"words": self.words,
+                "cached_words": self.cached_words,
+                "nodes": dict(sorted(self.nodes.items())),
+                "chart_hits": self.chart_hits,
+                "joins": dict(self.joins.most_common()),
+                "prunes": dict(self.prunes.most_common()),
+                "results": dict(self.results.most_common()),
+                "total_seconds": self.total_seconds,
+                "join_seconds": self.join_seconds,
+                "surface_seconds": self.surface_seconds,
+                "search_seconds": self.search_seconds}
+
+    def report(self, top: int = 10) -> str:
+        lines = [f"words: {self.words} searched, {self.cached_words} cached",
+                 f"nodes: {sum(self.nodes.values())} expanded, {self.chart_hits} from the chart",
+                 "  per depth: " + ", ".join(f"{depth}: {n}" for depth, n in sorted(self.nodes.items())),
+                 f"time: {self.total_seconds:.3f}s total, {self.join_seconds:.3f}s joining, "
+                 f"{self.surface_seconds:.3f}s realizing surfaces, {self.search_seconds:.3f}s searching",
+                 "joins per sandhi class:"]
+        lines += [f"  {name:28s} {n:10d}" for name, n in self.joins.most_common(top)]
+        lines.append("pruned branches:")
+        lines += [f"  {rule:28s} {n:10d}  ({PRUNE_RULES[rule]})" for rule, n in self.prunes.most_common()]
+        lines.append("analyses per base:")
+        lines += [f"  {base:28s} {n:10d}" for base, n in self.results.most_common(top)]
+        return "\n".join(lines)
+
+class SearchTracer:
+    """
+    Records the search tree: for each path of morphemes the search expanded 
+    (e.g. `iglu;-tu;-vuq`), how often and for how long, the time being inclusive 
+    of everything expanded below it. Set it as `KarmaAnalyzer.tracer` to trace 
+    every word searched from then on, and export it with `folded` for flame graph 
+    tools. A tracer must not be shared between threads.
+    """
+
+    def __init__(self):
+        self.stack: list[str] = []
+        self.seconds: defaultdict[tuple[str, ...], float] = defaultdict(float)
+        self.nodes: defaultdict[tuple[str, ...], int] = defaultdict(int)
+
+    def enter(self, label: str) -> tuple[str, ...]:
+        self.stack.append(label)
+        return tuple(self.stack)
+
+    def exit(self, path: tuple[str, ...], seconds: float) -> None:
+        self.seconds[path] += seconds
+        self.nodes[path] += 1
+        self.stack.pop()
+
+    def clear(self) -> None:
+        self.stack.clear()
+        self.seconds.clear()
+        self.nodes.clear()
+
+    def inclusive_nodes(self) -> dict[tuple[str, ...], int]:
+        inclusive: defaultdict[tuple[str, ...], int] = defaultdict(int)
+        for path, n in self.nodes.items():
+            for i in range(1, len(path) + 1):
+                inclusive[path[:i]] += n
+        return dict(inclusive)
+
+    def folded(self, value: str = "time") -> list[str]:
+        """
+        The folded stacks `path value`, with the self (not inclusive) value of each
+        path, as flame graph tools expect: microseconds for `value="time"`, 
+        expansions for `value="nodes"`.
+        """
+        if value == "nodes":
+            own = dict(self.nodes)
+        elif value == "time":
+            own = dict(self.seconds)
+            for path, seconds in self.seconds.items():
+                if len(path) > 1 and path[:-1] in own:
+                    own[path[:-1]] -= seconds
+            own = {path: round(seconds * 1_000_000) for path, seconds in own.items()}
+        else:
+            raise ValueError(f"unknown value {value!r}, expected 'time' or 'nodes'")
+        return [f"{';'.join(path)} {n}" for path, n in sorted(own.items()) if n > 0]
+
+    def export(self, path: str | Path, value: str = "time") -> None:
+        Path(path).write_text("".join(line + "\n" for line in self.folded(value)), encoding="utf-8")
+
+def traced(tracer: SearchTracer, label: str, expansion: Iterator) -> Iterator:
+    """
+    Yield from `expansion` as the node `label` below the current path of `tracer`, 
+    timing only the work done inside it (not while its consumer holds a result).
+    """
+    path = tracer.enter(label)
+    elapsed = 0.0
+    start = time.perf_counter()
+    try:
+        for item in expansion:
+            elapsed += time.perf_counter() - start
+            yield item
+            start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+    finally:
+        # close the nodes below first, so that the path stack unwinds in order
+        expansion.close()
+        tracer.exit(path, elapsed)
@@ -0,0 +1,114 @@
+"""
+A persistent on-disk cache of word analyses in a SQLite file, shared across
+processes and runs.
+
+Every entry is keyed by the word and a fingerprint of everything its analyses
+depend on (the lexicon files, the affix, ending and enclitic lists and the code
+building and searching them), so entries of an edited lexicon are simply never
+looked up again; `AnalysisStore.prune` deletes them. The database runs in WAL
+mode, so any number of processes can read while one of them writes.
+"""
+from __future__ import annotations
+from hashlib import sha256
+from pathlib import Path
+import pickle
+import sqlite3
+import threading
+from .lexicon import Lexicon
+from .structures import MorphemeSeqData, enclitics
+
+STORE_VERSION = 1
+
+def analysis_fingerprint(lexicon: Lexicon) -> str:
+    """Extend the lexicon fingerprint with the enclitics and the search and rule code."""
+    h = sha256(f"karma-analyses-v{STORE_VERSION}".encode())
+    h.update(lexicon.fingerprint.encode())
+    h.update(repr(enclitics).encode())
+    for module_file in ("encode_decode.py", "rules.py", "utils.py"):
+        h.update((Path(__file__).resolve().parent / module_file).read_bytes())
+    return h.hexdigest()
+
+class AnalysisStore:
+    """
+    Word analyses pickled into a SQLite table `analyses(fingerprint, word, value)`.
+
+    Each thread opens its own connection on first use (and again after the store
+    is pickled into another process), so a store can be shared between threads 
+    and handed to worker processes as a path.
+    """
+
+    def __init__(self, path: str | Path, timeout: float = 30.0):
+        self.path = Path(path)
+        self.timeout = timeout  # seconds to wait for a concurrent writer
+        self._local = threading.local()
+        self._lock = threading.Lock()  # for the counters
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # autocommit: every `put` is its own short transaction
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS analyses ("
+                         "fingerprint TEXT NOT NULL, word TEXT NOT NULL, value BLOB NOT NULL, "
+                         "PRIMARY KEY (fingerprint, word)) WITHOUT ROWID")
+            self._local.conn = conn
+        return conn
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"], state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _check(fingerprint: str) -> None:
+        if not fingerprint:
+            raise ValueError(f"analyses must be stored under a fingerprint, got {fingerprint!r}")
+
+    def get(self, fingerprint: str, word: str) -> list[MorphemeSeqData] | None:
+        self._check(fingerprint)
+        row = self.conn.execute("SELECT value FROM analyses WHERE fingerprint = ? AND word = ?",
+                                (fingerprint, word)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else pickle.loads(row[0])
+
+    def put(self, fingerprint: str, word: str, analyses: list[MorphemeSeqData]) -> None:
+        self._check(fingerprint)
+        value = pickle.dumps(analyses, protocol=pickle.HIGHEST_PROTOCOL)
+        self.conn.execute("INSERT OR REPLACE INTO analyses (fingerprint, word, value) VALUES (?, ?, ?)",
+                          (fingerprint, word, value))
+
+    def prune(self, fingerprint: str) -> int:
+        """Delete the entries of every other fingerprint and return how many there were."""
+        self._check(fingerprint)
+        cursor = self.conn.execute("DELETE FROM analyses WHERE fingerprint != ?", (fingerprint,))
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self) -> None:
+        """Close the connection of the calling thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -1,10 +1,12 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 import re
 from functools import cached_property
 from enum import Enum
 from itertools import product
+from .cache import LRUCache
+from . import rules
 from .utils import *
 
 class BaseSandhi:
@@ -520,6 +522,24 @@ class SandhiPOS(Enum):
     VERB = "verb"
     NOUN = "noun"
 
+# Realized surfaces keyed on (form, protected_len, form_is_sound), shared by all `Form`s.
+# The same forms recur constantly across bases, words and sentences.
+surface_cache = LRUCache(maxsize=200_000)
+
+# Results of `Stem.join` / `Word.join`, keyed on everything the sandhi rules look at:
+# the joining form, its right sandhi class and fields, `protected_len`, `greenlandic_i`
+# and the identity of the joined morpheme. The cached `Stem`s and `Word`s are shared 
+# between all callers, so they must not be mutated.
+join_cache = LRUCache(maxsize=50_000)
+
+def _cached_join(key: tuple, morph: Morpheme, join) -> list[Stem | Word]:
+    cached = join_cache.get(key)
+    # the morpheme is kept with the results, so its id cannot be reused by another one
+    if cached is None or cached[0] is not morph:
+        cached = (morph, tuple(join(morph)))
+        join_cache.put(key, cached)
+    return list(cached[1])
+
 # @dataclass
 # class Rule:
 #     pattern: typing.Pattern
@@ -549,13 +569,7 @@ class Form:
         It has not yet reached the stage of spelling, and
         some notational conventions are still waiting to be incorporated.
         """
-        protected_form = self.form[:self.protected_len]
-        form = self.form[self.protected_len:]
-        if len(form) > 0:
-            if not self.form_is_sound:
-                form = self._get_sound(form=form)
-            form = self._adjust_sound(form=form)
-        return protected_form + form
+        return self._realized[0]
 
     @cached_property
     def surface(self) -> str:
@@ -564,77 +578,40 @@ class Form:
 
         Any differences in spelling should come from different forms.
         """
+        return self._realized[1]
+
+    @cached_property
+    def _realized(self) -> tuple[str, str]:
+        """
+        The pair (`sound_surface`, `surface`), looked up in the process-wide
+        `surface_cache` before running the sound and spelling rules.
+        """
+        key = (self.form, self.protected_len, self.form_is_sound)
+        realized = surface_cache.get(key)
+        if realized is None:
+            realized = self._realize()
+            surface_cache.put(key, realized)
+        return realized
+
+    def _realize(self) -> tuple[str, str]:
         protected_form = self.form[:self.protected_len]
         form = self.form[self.protected_len:]
-        if len(form) > 0:
-            if not self.form_is_sound:
-                form = self._get_sound(form=form)
-            form = self._adjust_sound(form=form)
-            # TODO: we still need to adjust something here
-            form = self._sound_to_spelling(form=form)
-        return protected_form + form
-    
+        if len(form) == 0:
+            return protected_form, protected_form
+        if not self.form_is_sound:
+            form = self._get_sound(form=form)
+        form = self._adjust_sound(form=form)
+        # TODO: we still need to adjust something here
+        return protected_form + form, protected_form + self._sound_to_spelling(form=form)
+
     def _get_sound(self, form: str) -> str:
-        form = re.sub(pattern=f"({sound_dict['cons']})ð", repl=r"\1t", string=form)   # ð-rule-1
-        form = re.sub(pattern=f"({sound_dict['vow']})ð", repl=r"\1c", string=form)   # ð-rule-2
-        form = re.sub(pattern=f"i({sound_dict['cons']}?)t({sound_dict['vow']})", repl=r"i\1s\2", string=form) # t2s-rule
-        form = form.replace("T", "t") # release those not to be affected by the t2s rule
-        form = re.sub(pattern=f"({sound_dict['cons']})y", repl=r"\1g", string=form)  # y-rule-1
-        form = re.sub(pattern=f"({sound_dict['vow']})y", repl=r"\1j", string=form) # y-rule-2
-        form = re.sub(pattern=f"ə({sound_dict['cons']})", repl=r"i\1", string=form) # ə-rule-1
-        form = re.sub(pattern=f"ə([aiuəj])", repl=r"a\1", string=form) # ə-rule-2
-        form = form.replace("aai", "aavi")
-        form = form.replace("aau", "aaju")
-        return form
+        return rules.get_sound(form)
 
     def _adjust_sound(self, form: str) -> str:
-        # form = re.sub(pattern=rf"({sound_dict['vow']})V", repl=r"\1\1", string=form)
-
-        # modified a-rule to exclude -ai-ending ones
-        form = re.sub(pattern=rf"a(?!i\Z){sound_dict['vow']}", repl=r"aa", string=form) 
-        # TODO: t(ts)-rule
-        
-        # g-rule
-        form = form.replace("qg", "r") 
-        # consonant-rules
-        form = re.sub(pattern=f"{sound_dict['^qr_cons']}([qtslmnŋf])", repl=r"\1\1", string=form) 
-        form = re.sub(pattern=f"{sound_dict['^tqr_cons']}c", repl=r"cc", string=form)
-        form = re.sub(pattern="[qr]([tcslmn])", repl=r"r\1", string=form)
-        form = re.sub(pattern=f"{sound_dict['^qr_cons']}[vp]", repl="pp", string=form)
-        form = re.sub(pattern=f"[qr][vp]", repl="rp", string=form)
-        form = re.sub(pattern=f"{sound_dict['^gqr_cons']}[gk]", repl="kk", string=form)
-        form = re.sub(pattern=f"[qr][gk]", repl="rk", string=form)
-        # form = re.sub(pattern="[qr]v", repl="rp", string=form)
-
-        form = re.sub(pattern=f"i({sound_dict["uv"]})", repl=r"e\1", string=form) # uv-rule-1
-        form = form.replace("ie", "ee") # uv-rule-1
-        form = re.sub(pattern=f"u({sound_dict["uv"]})", repl=r"o\1", string=form) # uv-rule-2
-        form = form.replace("uo", "oo") # uv-rule-2
-
-        # form = re.sub(pattern="gg", repl="kk", string=form)
-        # form = re.sub(pattern="[qr]g", repl="rk", string=form)
-        form = re.sub(pattern="[qr]f", repl="rf", string=form)
-        form = re.sub(pattern=f"{sound_dict['^r_cons']}r", repl="qq", string=form)
-        # form = re.sub(pattern="[rq]q", repl="qq", string=form)
-        # form = re.sub(pattern="jj", repl="ss", string=form)
-
-        form = form.replace("ij", "i")
-        form = re.sub("uv([aie])", r"u\1", form)
-        form = form.replace("uuu", "uuju")
-        form = form.replace("iii", "iivi")
-        form = form.replace("aaa", "aava")
-        return form
+        return rules.adjust_sound(form)
     
     def _sound_to_spelling(self, form:str) -> str:
-        # TODO: we might need to add Vq/rC to here, depending on acc
-        form = form.replace("ŋŋ", "nng")
-        form = form.replace("ŋ", "ng")
-        form = form.replace("tti", "tsi")
-        form = form.replace("tte", "tse")
-        form = form.replace("c", "s")
-        form = form.replace("ɴɴ", "rng")
-        form = form.replace("ɴ", "rng")
-        return form
+        return rules.sound_to_spelling(form)
     
     @property
     def mofo_form(self):
@@ -651,6 +628,11 @@ class Word(Form):
         self.right.cons_end = bool(re.search(pattern=f"{sound_dict['cons']}$", string=self.form))
     
     def join(self, enc: Enclitic) -> list[Word | Stem]:
+        key = ("word", self.form, self.protected_len, self.form_is_sound, self.greenlandic_i, 
+               self.right.cons_end, id(enc))
+        return _cached_join(key, enc, self._join)
+
+    def _join(self, enc: Enclitic) -> list[Word | Stem]:
         assert isinstance(enc, Enclitic)
         if self.greenlandic_i and not self.form.endswith("i"):
             return []
@@ -662,9 +644,7 @@ class Word(Form):
             assert max(len(left_forms), len(right_forms)) == 2
             new_forms = list(l+r for l, r in zip(left_forms, right_forms))
         if "V" in right_forms[0]:
-            new_forms = [re.sub(pattern=rf"({sound_dict['vow']})V", 
-                                repl=r"\1\1", 
-                                string=new_form) for new_form in new_forms]
+            new_forms = [rules.lengthen_v(new_form) for new_form in new_forms]
         if isinstance(enc, CommonEnclitic):
             return [Word(form=new_form, 
                          form_is_sound=True, 
@@ -715,6 +695,16 @@ class Stem(NonEnding):
     # def metathesized(self):
     #     raise NotImplementedError
 
+    @property
+    def stable_len(self) -> int:
+        """
+        The length of the surface prefix that no subsequent sandhi can change, 
+        i.e. any word built on this stem starts with `surface[:stable_len]`.
+        """
+        if isinstance(self.right, (Type1MetathesisSandhi, Type2MetathesisSandhi)):
+            return len(self.surface[:-4])
+        return len(self.surface[:-3])
+
     @property
     def dropped(self):
         """The form dropping its last phoneme, no matter whether it is a consonant or vowel."""
@@ -739,6 +729,11 @@ class Stem(NonEnding):
 
     # TODO: we should be able to yield more than one way of joining
     def join(self, morph: NonStem) -> list[Stem | Word]:
+        key = ("stem", self.form, type(self.right), self.right.pos, self.right.cons_end, 
+               self.protected_len, self.greenlandic_i, id(morph))
+        return _cached_join(key, morph, self._join)
+
+    def _join(self, morph: NonStem) -> list[Stem | Word]:
         left_forms = self.right.right_join(self_stem=self, right_nonstem=morph)
         right_forms = morph.left.left_join(self_nonstem=morph, left_stem=self)
         if min(len(left_forms), len(right_forms)) == 1:
@@ -747,9 +742,7 @@ class Stem(NonEnding):
             assert max(len(left_forms), len(right_forms)) == 2
             new_forms = list(l+r for l, r in zip(left_forms, right_forms))
         # new_forms = [left_form + right_form]
-        new_forms = [re.sub(pattern=rf"({sound_dict['vow']})V", 
-                            repl=r"\1\1", 
-                            string=new_form) for new_form in new_forms]
+        new_forms = [rules.lengthen_v(new_form) for new_form in new_forms]
         results = []
         # TODO, this will be slow, notice that no judgments are done based on new forms
         for new_form in new_forms: 
@@ -995,10 +988,10 @@ class MorphemeSeq(BaseMorphemeSeq):
             # we allow MorphemeSeq to be incomplete, so not necessarily ending
             assert ((isinstance(morph0, Stem) and isinstance(morph1, NonStem)) 
                     or (isinstance(morph0, Word) and isinstance(morph1, Enclitic)))
-            new_morphs = morph0.join(morph1)
-            for new_morph in new_morphs:
-                new_morph.protected_len = self.protected_len
-            return new_morphs
+            # NOTE: joined forms may be shared through `join_cache`, so copy rather than mutate
+            return [new_morph if new_morph.protected_len == self.protected_len 
+                    else replace(new_morph, protected_len=self.protected_len)
+                    for new_morph in morph0.join(morph1)]
         last_morpheme, prior_morphemes = self.morphemes[-1], self.morphemes[:-1]
         priors = MorphemeSeq(morphemes=prior_morphemes, 
                              protected_len=self.protected_len).join()
@@ -1014,10 +1007,47 @@ class MorphemeSeq(BaseMorphemeSeq):
                                repr=rep) for rep in self.join()]
 
 
+class MorphemePath:
+    """
+    An immutable morpheme sequence stored as a chain of parent pointers: 
+    each node only keeps its last morpheme and the path before it.
+
+    Extending a path is O(1) and shares the whole prefix with every other 
+    extension of it, so no list is built until `to_list` is called.
+    """
+    __slots__ = ("last", "prior", "length")
+
+    def __init__(self, last: Morpheme, prior: MorphemePath | None = None):
+        self.last = last
+        self.prior = prior
+        self.length = 1 if prior is None else prior.length + 1
+
+    @classmethod
+    def from_list(cls, morphemes: list[Morpheme]) -> MorphemePath | None:
+        path = None
+        for morpheme in morphemes:
+            path = cls(morpheme, path)
+        return path
+
+    def extend(self, morpheme: Morpheme) -> MorphemePath:
+        return MorphemePath(morpheme, self)
+
+    def to_list(self) -> list[Morpheme]:
+        morphemes = []
+        node = self
+        while node is not None:
+            morphemes.append(node.last)
+            node = node.prior
+        morphemes.reverse()
+        return morphemes
+
+    def __len__(self):
+        return self.length
+
 # NOTE: we give up join here, and only use this as a container, to improve speed.
 # TODO: each MorphemeSeqData should still have one Word | Stem, 
 # BUT `extend` should produce LISTS of MorphemeSeqData
-@dataclass
+@dataclass(init=False)
 class MorphemeSeqData(BaseMorphemeSeq):
     """
     A mere data container tracking the sequence of morphemes and 
@@ -1026,13 +1056,31 @@ class MorphemeSeqData(BaseMorphemeSeq):
     There is no computational function here; users should use `MorphemeSeq` instead.
 
     The main usage of this class is to save the time of repeated `MorphemeSeq.join`
-    computations by using the `extend` method.
+    computations by using the `extend` method. The morphemes are kept as a 
+    `MorphemePath` sharing its prefix with the sequence it was extended from, 
+    and only turned into the list `morphemes` when needed (e.g. for rendering).
     """
-    repr: Stem | Word = field(default_factory=lambda _: Word(form=""))
+    repr: Stem | Word
+
+    def __init__(self, morphemes: list[Morpheme] | None = None, 
+                 protected_len: int = 0, 
+                 repr: Stem | Word | None = None, 
+                 path: MorphemePath | None = None):
+        self.path = path if path is not None else MorphemePath.from_list(morphemes or [])
+        self.protected_len = protected_len
+        self.repr = repr if repr is not None else Word(form="")
+
+    @cached_property
+    def morphemes(self) -> list[Morpheme]:
+        return self.path.to_list() if self.path is not None else []
+
+    @property
+    def last(self) -> Morpheme:
+        return self.path.last
 
     def extend(self, morpheme: Morpheme) -> list[MorphemeSeqData]:
-        extended_list = self.morphemes + [morpheme]
-        return [MorphemeSeqData(morphemes=extended_list, 
+        extended_path = MorphemePath(morpheme, self.path)
+        return [MorphemeSeqData(path=extended_path, 
                                 protected_len=self.protected_len, 
                                 repr=rep) for rep in self.repr.join(morpheme)]
 
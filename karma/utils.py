@@ -1,25 +1,45 @@
+consonants = "tscðpvfkgqrlmnŋjɴ"
+uvulars = "qrɴ"
+vowels = "aiuəV"
+
 def get_sound_regex() -> dict[str, str]:
     """
-    Build the sound dictionary to select a group of sounds, including vowels,
+    Build the full sound dictionary to select a group of sounds, including vowels,
     consonants, uvulars, or a group consonants excluding at most 3 consonants.
+
+    This eagerly builds all ~5,200 entries; `sound_dict` is the lazy equivalent.
     """
     from itertools import product
-    sound_dict: dict[str, str] = {}
-    consonants = "tscðpvfkgqrlmnŋjɴ"
-    uvulars = "qrɴ"
-    vowels = "aiuəV"
-    for con in consonants:
-        sound_dict["cons"] = f"[{consonants}]"
-        sound_dict["vow"] = f"[{vowels}]"
-        sound_dict["uv"] = f"[{uvulars}]"
-        sound_dict[f"^{con}_cons"] = f"[{''.join(filter(lambda c: c != con, consonants))}]"
-    for twocon in ["".join(l) for l in product(consonants, consonants)]:
-        sound_dict[f"^{twocon}_cons"] = f"[{''.join(filter(lambda c: c not in twocon, consonants))}]"
-    for tricon in ["".join(l) for l in product(consonants, consonants, consonants)]:
-        sound_dict[f"^{tricon}_cons"] = f"[{''.join(filter(lambda c: c not in tricon, consonants))}]"
+    sound_dict: dict[str, str] = {
+        "cons": f"[{consonants}]",
+        "vow": f"[{vowels}]",
+        "uv": f"[{uvulars}]",
+    }
+    for n in (1, 2, 3):
+        for excluded in ["".join(l) for l in product(consonants, repeat=n)]:
+            sound_dict[f"^{excluded}_cons"] = _excluding_cons(excluded)
     return sound_dict
 
-sound_dict = get_sound_regex()
+def _excluding_cons(excluded: str) -> str:
+    return f"[{''.join(filter(lambda c: c not in excluded, consonants))}]"
+
+class SoundDict(dict):
+    """
+    The sound dictionary of `get_sound_regex`, with the `^xyz_cons` exclusion
+    classes only computed (and then kept) upon first request.
+    """
+
+    def __init__(self):
+        super().__init__(cons=f"[{consonants}]", vow=f"[{vowels}]", uv=f"[{uvulars}]")
+
+    def __missing__(self, key: str) -> str:
+        excluded = key[1:-5] if key.startswith("^") and key.endswith("_cons") else ""
+        if not 1 <= len(excluded) <= 3 or any(c not in consonants for c in excluded):
+            raise KeyError(key)
+        self[key] = _excluding_cons(excluded)
+        return self[key]
+
+sound_dict = SoundDict()
 
 def is_vowel(char: str):
     assert len(char) == 1
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from collections.abc import Iterator, Mapping
 from .structures import Stem, Word, is_ou, is_aie, RightSandhi, AqDropSandhi, \
     TeSandhi, WeakenableSandhi, GemSandhi, UsiqSandhi, SandhiPOS, sound_dict, \
     GeSandhi, WeakQStemSandhi, KStemSandhi, Type1MetathesisSandhi, Type2MetathesisSandhi, TcTriggerSandhi, enclitics, \
@@ -74,6 +75,80 @@ def get_protected_len(base: Stem):
 
 abbrs = ('kg', 'nr', 'kni', 'kr', 'km', 'chr')
 
+def letter_class(init: str) -> str:
+    """The bucket key of bases without a protected prefix, e.g. `a|i|e` or `k|`."""
+    if is_ou(init):
+        return "o|u"
+    if is_aie(init):
+        return "a|i|e"
+    return init.lower() + "|"
+
+class BaseIndex(Mapping):
+    """
+    The bases bucketed by the class of their initial letter (keys such as `a|i|e`, `k|`)
+    or by their protected surface prefix (keys such as `film`).
+
+    Besides the buckets, two tries are kept: one over the protected prefixes, 
+    to find the buckets applying to a word, and one over the stable surface prefix 
+    of each base (see `Stem.stable_len`), so that `candidates` only returns bases 
+    whose stable prefix matches the word, in time proportional to the word length.
+    """
+
+    _entries = ""  # trie key holding what is stored at the prefix ending at that node
+
+    def __init__(self, buckets: dict[str, list[Stem]]):
+        self._buckets = dict(buckets)
+        self._prefix_trie: dict = {}
+        self._stable_trie: dict = {}
+        for key, bucket in self._buckets.items():
+            if "|" not in key:
+                self._trie_node(self._prefix_trie, key)[self._entries] = bucket
+            for base in bucket:
+                stable = base.surface[:base.stable_len]
+                self._trie_node(self._stable_trie, stable).setdefault(self._entries, []).append((key, base))
+
+    @staticmethod
+    def _trie_node(trie: dict, key: str) -> dict:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        return node
+
+    def __getitem__(self, key: str) -> list[Stem]:
+        return self._buckets[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._buckets)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def prefix_keys(self, word: str) -> Iterator[str]:
+        """The protected-prefix keys that are a prefix of `word`, shortest first."""
+        node = self._prefix_trie
+        for i, char in enumerate(word.lower()):
+            node = node.get(char)
+            if node is None:
+                return
+            if self._entries in node:
+                yield word[:i+1].lower()
+
+    def candidates(self, word: str) -> Iterator[Stem]:
+        """
+        The bases of the buckets applying to `word` (its letter class and the 
+        protected prefixes it starts with) whose stable surface prefix `word` starts with, 
+        leaving at least two more letters to the word.
+        """
+        keys = {letter_class(word[0]), *self.prefix_keys(word)}
+        node = self._stable_trie
+        depth = 0
+        while node is not None and depth + 1 < len(word):
+            for key, base in node.get(self._entries, ()):
+                if key in keys:
+                    yield base
+            node = node.get(word[depth])
+            depth += 1
+
 def get_sandhi(base_str: str, word_mappings: dict[str]) -> RightSandhi:
     if base_str in word_mappings:
         if base_str.endswith('q'):  # for kavaajaq
@@ -113,11 +188,19 @@ def get_sandhi(base_str: str, word_mappings: dict[str]) -> RightSandhi:
         return WeakQStemSandhi(pos=None) # TODO
     return RightSandhi(pos=None)
 
-def get_words_and_bases(files: list[Path]):
+def get_words_and_bases(files: list[Path], 
+                        mappings: dict[str, tuple[str, bool]] | None = None
+                        ) -> tuple[dict[str, list[Word]], BaseIndex]:
+    """
+    Read the words and bases of `files`. The loanwords found on the way are added to 
+    `mappings`, by default a copy of `word_mappings`, which is never modified.
+    """
+    if mappings is None:
+        mappings = dict(word_mappings)
     bases: dict[str, list[Stem]] = defaultdict(list)
     words: dict[str, list[Word]] = defaultdict(list)
 
-    for (word, (head, _)) in word_mappings.items():
+    for (word, (head, _)) in mappings.items():
         assert word.startswith(head)
     for file in files:
         base_flag = False
@@ -130,9 +213,9 @@ def get_words_and_bases(files: list[Path]):
                     base_flag = False
                 if word_flag and line != "":
                     word_str = line.split()[0].lower()
-                    if word_str not in word_mappings:
-                        check_and_add_loanword_simple(word=word_str, mapping=word_mappings)
-                    protected_len = len(word_mappings[word_str][0]) if word_str in word_mappings else 0
+                    if word_str not in mappings:
+                        check_and_add_loanword_simple(word=word_str, mapping=mappings)
+                    protected_len = len(mappings[word_str][0]) if word_str in mappings else 0
                     init = word_str[0]
                     if is_ou(init):
                         words['o|u'].append(Word(form=word_str, protected_len=protected_len))
@@ -147,15 +230,15 @@ def get_words_and_bases(files: list[Path]):
                     if base_str == "kaq": # derivenclitic, not base
                         continue
                     greenlandic_i = False
-                    if base_str not in word_mappings:
-                        check_and_add_loanword_simple(word=base_str, mapping=word_mappings)
-                    if base_str in word_mappings:
-                        protected_len = len(word_mappings[base_str][0])
-                        greenlandic_i = word_mappings[base_str][1]
+                    if base_str not in mappings:
+                        check_and_add_loanword_simple(word=base_str, mapping=mappings)
+                    if base_str in mappings:
+                        protected_len = len(mappings[base_str][0])
+                        greenlandic_i = mappings[base_str][1]
                     else:
                         protected_len = 0
                     init = base_str[0]
-                    sandhi = get_sandhi(base_str=base_str, word_mappings=word_mappings)
+                    sandhi = get_sandhi(base_str=base_str, word_mappings=mappings)
                     # TODO: probably should change this in `get_sandhi`
                     if bool(re.search(f"{sound_dict['cons']}$", base_str)):
                         sandhi.cons_end = True
@@ -186,4 +269,4 @@ def get_words_and_bases(files: list[Path]):
     #     for b in base_list:
     #         if b.form.startswith("svens"):
     #             print(b, k)
-    return words, new_bases
+    return words, BaseIndex(new_bases)
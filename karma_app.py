@@ -1,49 +1,119 @@
 from flask import Flask, request, render_template
-from karma.encode_decode import parse_sentence
+from karma.batch import start_pool, submit_sentence
+from karma.cache import LRUCache
+from karma.encode_decode import default_analyzer
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from threading import Lock, BoundedSemaphore
 import argparse
+import os
 from waitress import serve
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--port", default="5000") 
+parser.add_argument("--threads", type=int, default=4, 
+                    help="number of threads serving requests at once")
+parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, 
+                    help="number of processes analyzing sentences (0: analyze in the serving threads)")
+parser.add_argument("--queue", type=int, default=None, 
+                    help="sentences being analyzed or waiting for a worker at once, beyond which "
+                         "requests are turned away with 503 (default: 4 per worker)")
+parser.add_argument("--timeout", type=float, default=30.0, 
+                    help="seconds to wait for the analysis of a sentence before giving up with 504")
 args = parser.parse_args()
 port: str = args.port
 
 app = Flask(__name__)
 
-# Keep the last 5 sentences and cache their results
+# Keep the last 5 sentences and cache their results; requests are served by several threads
 history = deque(maxlen=5)
+history_lock = Lock()
 # sentence -> (result list of lists in traditional form, result list of lists in mofo form)
-results_cache: dict[str, tuple[list[list[str]], list[list[str]]]] = {}  
+results_cache = LRUCache(maxsize=1000)
+
+# the worker processes, started in `__main__`; without them sentences are analyzed in the request thread
+pool: ProcessPoolExecutor | None = None
+# a slot per sentence being analyzed or waiting in the pool
+queue_slots = BoundedSemaphore(args.queue or 4 * max(args.workers, 1))
+
+class AnalysisError(Exception):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+TIMEOUT_MESSAGE = "The analysis took too long and was given up."
+
+def analyze(sentence: str) -> tuple[list[list[str]], list[list[str]]]:
+    """The analyses of `sentence` in traditional and mofo form, from a worker if there is a pool."""
+    if pool is None:
+        parsed = default_analyzer.parse_sentence(sentence, max_seconds=args.timeout)
+        if any(parsed.truncated):
+            raise AnalysisError(TIMEOUT_MESSAGE, 504)
+        return parsed.list_str, parsed.list_mofo_str
+    if not queue_slots.acquire(blocking=False):
+        raise AnalysisError("The server is busy, please try again in a moment.", 503)
+    try:
+        # the search of the whole sentence stops after the timeout, so abandoned work does not linger
+        future = submit_sentence(pool, sentence, max_seconds=args.timeout)
+    except BaseException:
+        queue_slots.release()
+        raise
+    # the slot stays taken until a worker is done with the sentence, even after a timeout
+    future.add_done_callback(lambda _: queue_slots.release())
+    try:
+        list_str, list_mofo, truncated = future.result(timeout=args.timeout)
+    except TimeoutError:
+        # drop it if it is still waiting; a running one is abandoned and stops at its own deadline
+        future.cancel()
+        raise AnalysisError(TIMEOUT_MESSAGE, 504) from None
+    if truncated:  # out of time in the worker: incomplete, and not to be cached
+        raise AnalysisError(TIMEOUT_MESSAGE, 504)
+    return list_str, list_mofo
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
     parsed_list_str, parsed_list_mofo = None, None
+    error, status = None, 200
     view = request.form.get('view', 'str')
     sentence = request.form.get('sentence', '')
     if request.method == 'POST':
         if sentence:
             # check cache
-            if sentence in results_cache:
-                parsed_list_str, parsed_list_mofo = results_cache[sentence]
-            else:
-                parsed = parse_sentence(sentence.lower())
-                parsed_list_str = parsed.list_str
-                parsed_list_mofo = parsed.list_mofo_str
-                results_cache[sentence] = (parsed_list_str, parsed_list_mofo)
-            # update history
-            if sentence in history:
-                history.remove(sentence)
-            history.appendleft(sentence)
+            cached = results_cache.get(sentence)
+            if cached is None:
+                try:
+                    cached = analyze(sentence.lower())
+                    results_cache.put(sentence, cached)
+                except AnalysisError as e:
+                    error, status = str(e), e.status
+            if cached is not None:
+                parsed_list_str, parsed_list_mofo = cached
+                # update history
+                with history_lock:
+                    if sentence in history:
+                        history.remove(sentence)
+                    history.appendleft(sentence)
             # print(list(history))
+    with history_lock:
+        recent = list(history)
     return render_template('index.html', 
                            result_str=parsed_list_str,
                            result_mofo=parsed_list_mofo, 
                            sentence=sentence, 
-                           history=list(history), 
-                           view=view)
+                           history=recent, 
+                           view=view,
+                           error=error), status
 
 if __name__ == '__main__':
     host = "127.0.0.1"
+    if args.workers > 0:
+        print(f"Starting {args.workers} workers ...")
+        pool = start_pool(args.workers)
+    else:
+        default_analyzer.load()  # rather than in the first request
     print(f"Serving on http://{host}:{port} ...")
-    serve(app, port=port)
+    try:
+        serve(app, port=port, threads=args.threads)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)